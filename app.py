@@ -1,14 +1,50 @@
 import streamlit as st
-import streamlit.components.v1 as components
-import random
+import streamlit.components.v2 as components_v2
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import time
-import pandas as pd
 import os
-import json
+import csv
+import io
+import html
+import uuid
+from storage import DEFAULT_CLASSROOM, open_storage
+from classroom import ClassroomStore
+from history import ScoreHistory
+from importer import import_roster
+from telemetry import Telemetry
+from grouping import form_groups
+from questions import QuestionBank
+from sessions import SessionMemory
+from replicas import Coordinator
+from reports import ExportJob
+from derivatives import DerivativeCache, ImagePrefetcher
 
 # --- Page Config (Wide Mode) ---
 st.set_page_config(page_title="Bodies Speak Louder than Language", page_icon="🎓", layout="wide")
 
+# --- 📊 TELEMETRY ---
+# Timing spans per script section and fragment, rerun counts per session and
+# optional cProfile sampling. Open the app with ?admin=1 for the summary.
+@st.cache_resource
+def get_telemetry():
+    return Telemetry(metrics_file=os.environ.get("CLASSROOM_METRICS_FILE"),
+                     profile_rate=float(os.environ.get("CLASSROOM_PROFILE_RATE", "0")))
+
+telemetry = get_telemetry()
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex[:8]
+telemetry.begin_run(st.session_state.session_id)
+
+def rerun():
+    # st.rerun() ends the script before end_run; close this run's telemetry (and profiler) first
+    telemetry.cancel_run()
+    st.rerun()
+
+def fragment_session():
+    """This session's id during a fragment-only rerun; None in a full run (counted by begin_run)."""
+    ctx = get_script_run_ctx()
+    return st.session_state.session_id if ctx and ctx.fragment_ids_this_run else None
+
 # --- CSS Styling ---
 st.markdown("""
     <style>
@@ -71,19 +107,21 @@ st.markdown("""
     .stRadio label:hover { border-color: #3498db; color: #3498db; transform: translateX(5px); background-color: #f0f8ff; }
     .stRadio > label { display: none !important; }
     
-    /* Group Card Styling */
-    .group-card {
-        background-color: #fff; padding: 15px; border-radius: 10px; border: 2px solid #d1d5db;
-        margin-bottom: 10px; text-align: center; box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-    }
-    .group-title { font-size: 20px; font-weight: bold; color: #2c3e50; margin-bottom: 5px;}
-    .group-score { font-size: 36px; font-weight: 900; color: #e74c3c; margin: 5px 0; }
-    .group-members { color: #555; font-size: 14px; min-height: 40px; border-top: 1px dashed #eee; padding-top: 5px;}
+    /* Scoreboard Table Styling */
+    .score-table { max-height: 420px; overflow-y: auto; border: 1px solid #e0e0e0; border-radius: 8px; }
+    .score-table table { width: 100%; border-collapse: collapse; font-size: 16px; }
+    .score-table th { position: sticky; top: 0; background-color: #f8f9fa; color: #555; text-align: left; padding: 8px 12px; }
+    .score-table td { padding: 6px 12px; border-top: 1px solid #f0f0f0; color: #2c3e50; }
+    .score-table td:last-child, .score-table th:last-child { text-align: right; font-weight: bold; }
+
+    /* Hidden preload of the next quiz image */
+    [class*="st-key-quiz_preload_"] { display: none !important; }
     </style>
     """, unsafe_allow_html=True)
 
+telemetry.lap("css")
+
 # --- 💾 DATA PERSISTENCE ---
-DATA_FILE = "classroom_data.csv"
 DEFAULT_STUDENTS = [
     "Alice", "Bob", "Charlie", "David", "Eve", "Frank", "Grace", 
     "Henry", "Ivy", "Jack", "Kevin", "Lily", "Mike", "Nina", "Oliver", 
@@ -91,487 +129,890 @@ DEFAULT_STUDENTS = [
     "Wendy", "Xander", "Yara", "Zoe", "Leo", "Mia", "Ben"
 ]
 
-def save_data(student_list, score_dict):
+@st.cache_resource
+def get_storage():
+    return open_storage()
+
+storage = get_storage()
+
+HISTORY_FOLDER = os.environ.get("CLASSROOM_HISTORY", "classroom_history")
+
+@st.cache_resource
+def get_coordinator():
+    # Several app processes (replicas) sharing one storage: see replicas.py
+    root = os.environ.get("CLASSROOM_COORDINATION")
+    return Coordinator(root) if root else None
+
+@st.cache_resource
+def get_classroom_store(classroom):
+    # One store per classroom for the whole process: parsed once, shared by every tab
+    return ClassroomStore(storage, classroom, DEFAULT_STUDENTS, ScoreHistory(HISTORY_FOLDER, classroom), get_coordinator())
+
+def store_write(action, *args):
+    """Run a ClassroomStore write, surfacing storage errors in the UI."""
+    seen = store.version
     try:
-        data = []
-        for name in student_list:
-            data.append({"Name": name, "Score": score_dict.get(name, 0)})
-        df = pd.DataFrame(data)
-        df.to_csv(DATA_FILE, index=False)
+        action(*args)
     except Exception as e:
         st.error(f"Error saving data: {e}")
+        return False
+    # If ours was the only change, adopt it now so a fragment rerun is enough;
+    # anything else is left to watch_classroom's full rerun.
+    if seen == st.session_state.get('store_version') and store.version == seen + 1: sync_session()
+    return True
+
+SNAPSHOT_KEYS = ("students", "scores", "groups", "group_scores", "seat_layout", "seats", "last_pick", "timer_end")
+
+def sync_session():
+    """Copy the shared classroom into this session, only if it changed since last run (or the copy is gone)."""
+    if st.session_state.get('store_version') == store.version and all(k in st.session_state for k in SNAPSHOT_KEYS): return
+    st.session_state.store_version, *values = store.snapshot()
+    for key, value in zip(SNAPSHOT_KEYS, values): st.session_state[key] = value
+
+# --- 🧹 SESSION MEMORY ---
+# Sessions idle for a while (or the oldest ones, over the budget) give up
+# their copy of the classroom, reloaded from the store on wake-up, and spill
+# their quiz state to disk; see sessions.py. ?admin=1 shows the numbers.
+SESSION_REBUILDABLE = SNAPSHOT_KEYS + ("seat_chart_sent", "battle_sent")
+
+def spill_key(key):
+    return key.endswith(("_image", "_image_name", "_index"))   # per-game quiz position
+
+@st.cache_resource
+def get_session_memory():
+    return SessionMemory(os.environ.get("CLASSROOM_SESSIONS", "classroom_sessions"),
+                         budget_bytes=int(os.environ.get("CLASSROOM_SESSION_BUDGET_MB", "64")) * 1024 * 1024,
+                         rebuildable=SESSION_REBUILDABLE, spill=spill_key)
 
-def load_data():
-    default_scores = {name: 0 for name in DEFAULT_STUDENTS}
-    if os.path.exists(DATA_FILE):
-        try:
-            df = pd.read_csv(DATA_FILE)
-            if df.empty: return DEFAULT_STUDENTS, default_scores
-            if "Name" not in df.columns or "Score" not in df.columns: return DEFAULT_STUDENTS, default_scores
-            loaded_students = df["Name"].astype(str).tolist()
-            loaded_scores = dict(zip(df["Name"].astype(str), df["Score"].astype(int)))
-            for name in loaded_students:
-                if name not in loaded_scores: loaded_scores[name] = 0
-            return loaded_students, loaded_scores
-        except: return DEFAULT_STUDENTS, default_scores
-    else: return DEFAULT_STUDENTS, default_scores
+memory = get_session_memory()
+
+def wake_session():
+    """Mark this session active; True (and the classroom copy marked stale) if it had been evicted."""
+    if not memory.touch(st.session_state.session_id, get_script_run_ctx().session_state): return False
+    st.session_state.store_version = None
+    return True
+
+def wake_fragment():
+    # A fragment-only rerun skips the top of the script, where the session is woken
+    if wake_session(): sync_session()
+
+def wake_for_callback():
+    # Widget and component callbacks run before the script (or fragment) wakes the session
+    wake_session()
+    sync_session()
 
 # --- Initialize Session State ---
-if 'students' not in st.session_state or 'scores' not in st.session_state:
-    l_students, l_scores = load_data()
-    st.session_state.students = l_students
-    st.session_state.scores = l_scores
-
-if 'lying_image' not in st.session_state: st.session_state.lying_image = None
-if 'lying_image_name' not in st.session_state: st.session_state.lying_image_name = ""
-if 'love_image' not in st.session_state: st.session_state.love_image = None
-if 'love_image_name' not in st.session_state: st.session_state.love_image_name = ""
-
-# ✨ SEQUENTIAL INDEX TRACKING (A-Z Loop)
-if 'lying_index' not in st.session_state: st.session_state.lying_index = 0
-if 'love_index' not in st.session_state: st.session_state.love_index = 0
-
-if 'groups' not in st.session_state: st.session_state.groups = []
-if 'group_scores' not in st.session_state: st.session_state.group_scores = {}
-if 'timer_end_time' not in st.session_state: st.session_state.timer_end_time = 0
-if 'timer_running' not in st.session_state: st.session_state.timer_running = False
+if 'classroom' not in st.session_state: st.session_state.classroom = os.environ.get("CLASSROOM", DEFAULT_CLASSROOM)
+store = get_classroom_store(st.session_state.classroom)
+wake_session()
+sync_session()
+
 if 'quiz_counter' not in st.session_state: st.session_state.quiz_counter = 0
+if 'feedback' not in st.session_state: st.session_state.feedback = []
+telemetry.lap("load_data")
 
-# --- ✨ HELPER: PICK NEXT IMAGE (SEQUENTIAL LOOP) ---
-def pick_next_image(keywords, state_prefix):
-    if isinstance(keywords, str): keywords = [keywords]
-        
-    script_dir = os.path.dirname(os.path.abspath(__file__)) 
-    folder_path = os.path.join(script_dir, "images")
-    
+# --- 🎉 DEFERRED FEEDBACK ---
+# Handlers queue their confirmation and rerun straight away; the toast (and
+# balloons) are shown by the next run, so no request thread sleeps to keep a
+# message on screen.
+def queue_feedback(message, icon="✅", balloons=False):
+    st.session_state.feedback.append((message, icon, balloons))
+
+def flush_feedback():
+    if not st.session_state.feedback: return
+    for message, icon, balloons in st.session_state.feedback:
+        st.toast(message, icon=icon)
+        if balloons: st.balloons()
+    st.session_state.feedback = []
+
+flush_feedback()
+
+# --- 🗂️ QUESTION BANK (shared by all sessions) ---
+# Games, options and answers come from questions.DEFAULT_GAMES plus an
+# optional quiz.json manifest in the image folder; see questions.py.
+IMAGE_FOLDER = os.environ.get("CLASSROOM_IMAGES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "images"))
+
+@st.cache_resource
+def get_question_bank(folder_path):
+    return QuestionBank(folder_path)
+
+# --- 🖼️ IMAGE DERIVATIVES (resized copies for the quiz tabs) ---
+# Rendering, caching and prefetching live in derivatives.py.
+DERIVATIVE_FOLDER = os.environ.get("CLASSROOM_IMAGE_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_cache"))
+DERIVATIVE_CACHE_BYTES = 256 * 1024 * 1024
+QUIZ_IMAGE_WIDTH = 960
+
+@st.cache_resource
+def get_derivative_cache(cache_dir, max_bytes):
+    return DerivativeCache(cache_dir, max_bytes)
+
+@st.cache_resource
+def get_image_prefetcher(cache_dir, max_bytes):
+    return ImagePrefetcher(get_derivative_cache(cache_dir, max_bytes), QUIZ_IMAGE_WIDTH)
+
+def quiz_image_src(path, width=QUIZ_IMAGE_WIDTH):
+    try: return get_derivative_cache(DERIVATIVE_FOLDER, DERIVATIVE_CACHE_BYTES).get(path, width)
+    except Exception: return path   # a broken cache must never hide the question
+
+# --- ✨ HELPER: PICK NEXT QUESTION (SEQUENTIAL LOOP) ---
+def pick_next_image(game):
+    folder_path = IMAGE_FOLDER
     if not os.path.exists(folder_path):
         st.error(f"⚠️ Image folder not found!\nPath: {folder_path}")
         return
 
-    valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
     try:
-        all_files = [f for f in os.listdir(folder_path) if os.path.splitext(f)[1].lower() in valid_extensions]
-        
-        # Filter files by keywords
-        filtered_files = []
-        for f in all_files:
-            for k in keywords:
-                if k.lower() in f.lower():
-                    filtered_files.append(f)
-                    break
-        
-        # Sort alphabetically to ensure consistent sequence
-        filtered_files.sort()
-        
-        if not filtered_files:
-            st.warning(f"⚠️ No images found matching: {', '.join(keywords)}.")
+        idx_key = f"{game}_index"
+        question, next_idx = get_question_bank(folder_path).next_after(game, st.session_state[idx_key])
+
+        if question is None:
+            st.warning("⚠️ No images found for this game.")
         else:
-            # Get current index
-            idx_key = f"{state_prefix}_index"
-            current_idx = st.session_state[idx_key]
-            
-            # Loop back to 0 if we reached the end
-            if current_idx >= len(filtered_files):
-                current_idx = 0
-            
-            # Select image
-            selected_img = filtered_files[current_idx]
-            
-            # Update Path
-            full_path = os.path.join(folder_path, selected_img)
-            st.session_state[f"{state_prefix}_image"] = full_path
-            st.session_state[f"{state_prefix}_image_name"] = selected_img.lower()
-            
-            # Increment index for NEXT time
-            next_idx = current_idx + 1
-            if next_idx >= len(filtered_files):
-                next_idx = 0
-            
+            st.session_state[f"{game}_image"] = os.path.join(folder_path, question.file)
+            st.session_state[f"{game}_image_name"] = question.file
+
+            # Index for NEXT time (already wrapped to 0 at the end)
             st.session_state[idx_key] = next_idx
-            
+
     except Exception as e: st.error(f"Error: {e}")
 
+# --- ⏩ HELPER: PREFETCH UPCOMING IMAGES ---
+PREFETCH_COUNT = 3
+
+def prefetch_upcoming(game):
+    try:
+        names = get_question_bank(IMAGE_FOLDER).peek(game, st.session_state[f"{game}_index"], PREFETCH_COUNT)
+        upcoming = [os.path.join(IMAGE_FOLDER, n) for n in names]
+        get_image_prefetcher(DERIVATIVE_FOLDER, DERIVATIVE_CACHE_BYTES).submit(upcoming)
+        # Preload hint: once the next image is ready, render it in a hidden container
+        # so the browser already holds it (media URLs are content hashes) when it is shown.
+        ready = upcoming and get_derivative_cache(DERIVATIVE_FOLDER, DERIVATIVE_CACHE_BYTES).cached(upcoming[0], QUIZ_IMAGE_WIDTH)
+        if ready:
+            with st.container(key=f"quiz_preload_{game}"):
+                st.image(ready)
+    except Exception: pass   # prefetching is best-effort
+
+# --- 🕒 SHARED FLOATING TIMER ---
+# The timer belongs to the classroom (ClassroomStore.timer_end, on the server
+# clock), so one Start/Stop reaches every screen showing the class. The
+# component below puts a single floating element and a single
+# requestAnimationFrame loop on the page the first time it mounts; later
+# data changes only move the end time. Frames where the displayed second
+# hasn't changed return without touching the DOM.
+TIMER_JS = """
+const STYLE = `
+#custom-floating-timer { position: fixed; bottom: 20px; right: 20px; z-index: 999999;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 15px 25px;
+    border-radius: 50px; font-family: Arial, sans-serif; font-size: 28px; font-weight: bold;
+    box-shadow: 0 4px 15px rgba(0,0,0,0.3); transition: transform 0.2s, background 0.5s; }
+#custom-floating-timer.urgent { background: linear-gradient(135deg, #ff416c 0%, #ff4b2b 100%);
+    animation: timer-pulse 1s steps(1) infinite; }
+#custom-floating-timer.done { background: #e74c3c; transform: scale(1.2); }
+@keyframes timer-pulse { 0% { transform: scale(1.1); } 50% { transform: scale(1); } }
+`;
+
+function createTimer() {
+    const style = document.createElement('style');
+    style.textContent = STYLE;
+    document.head.appendChild(style);
+    const el = document.createElement('div');
+    el.id = 'custom-floating-timer';
+    el.hidden = true;
+    document.body.appendChild(el);
+    const timer = { end: null, offset: 0, shown: null, frame: 0 };
+
+    function tick() {
+        timer.frame = 0;
+        if (timer.end === null) return;
+        const remaining = timer.end - (Date.now() / 1000 + timer.offset);
+        const second = Math.max(Math.ceil(remaining), 0);
+        if (second !== timer.shown) {
+            timer.shown = second;
+            if (second > 0) {
+                const m = Math.floor(second / 60), s = second % 60;
+                el.textContent = (m < 10 ? "0" + m : m) + ":" + (s < 10 ? "0" + s : s);
+                el.className = second <= 10 ? 'urgent' : '';
+            } else {
+                el.textContent = "TIME'S UP!";
+                el.className = 'done';
+            }
+        }
+        if (second > 0) timer.frame = requestAnimationFrame(tick);
+    }
+    timer.set = function (end, serverNow) {
+        timer.offset = serverNow - Date.now() / 1000;   // server clock, not this device's
+        if (end === timer.end) return;
+        timer.end = end;
+        timer.shown = null;
+        el.hidden = end === null;
+        if (timer.frame) cancelAnimationFrame(timer.frame);
+        timer.frame = 0;
+        tick();
+    };
+    return timer;
+}
+
+export default function (component) {
+    const { data } = component;
+    // Once per page, however often the component re-renders or remounts
+    if (!window.classroomTimer) window.classroomTimer = createTimer();
+    window.classroomTimer.set(data.end, data.now);
+}
+"""
+
+@st.cache_resource
+def get_timer_component():
+    return components_v2.component("floating_timer", js=TIMER_JS)
+
+@st.fragment
+@telemetry.timed("timer_panel", fragment_session)
+def timer_panel():
+    wake_fragment()
+    st.header("⏱️ Floating Timer")
+    t_min = st.number_input("Minutes", 0, 60, 5)
+    t_sec = st.number_input("Seconds", 0, 59, 0)
+    col_t1, col_t2 = st.columns(2)
+
+    with col_t1:
+        if st.button("▶ Start", type="primary"):
+            store_write(store.start_timer, (t_min * 60) + t_sec)
+
+    with col_t2:
+        if st.button("⏹ Stop"):
+            store_write(store.stop_timer)
+
+    get_timer_component()(key="floating_timer", data={"end": st.session_state.timer_end, "now": time.time()})
+
 # --- Sidebar: Settings & Timer ---
-st.sidebar.header("⏱️ Floating Timer")
-t_min = st.sidebar.number_input("Minutes", 0, 60, 5)
-t_sec = st.sidebar.number_input("Seconds", 0, 59, 0)
-col_t1, col_t2 = st.sidebar.columns(2)
-
-with col_t1:
-    if st.sidebar.button("▶ Start", type="primary"):
-        duration = (t_min * 60) + t_sec
-        st.session_state.timer_end_time = time.time() + duration
-        st.session_state.timer_running = True
-        st.rerun()
-
-with col_t2:
-    if st.sidebar.button("⏹ Stop"):
-        st.session_state.timer_end_time = 0
-        st.session_state.timer_running = False
-        st.rerun()
+with st.sidebar: timer_panel()
 
 st.sidebar.divider()
 st.sidebar.header("⚙️ Settings")
+if storage.multi_classroom:
+    NEW_CLASSROOM = "➕ New classroom..."
+    classrooms = storage.list_classrooms()
+    if st.session_state.classroom not in classrooms: classrooms.append(st.session_state.classroom)
+    chosen = st.sidebar.selectbox("Classroom", classrooms + [NEW_CLASSROOM], index=classrooms.index(st.session_state.classroom))
+    if chosen == NEW_CLASSROOM:
+        new_classroom = st.sidebar.text_input("New classroom name").strip()
+        if st.sidebar.button("Create Classroom") and new_classroom:
+            st.session_state.classroom = new_classroom
+            st.session_state.store_version = None
+            rerun()
+    elif chosen != st.session_state.classroom:
+        st.session_state.classroom = chosen
+        st.session_state.store_version = None
+        rerun()
 st.sidebar.subheader("Student List")
 input_names = st.sidebar.text_area("Names (one per line)", value="\n".join(st.session_state.students), height=150)
 if st.sidebar.button("Update List"):
     new_list = [name.strip() for name in input_names.split('\n') if name.strip()]
     if not new_list: st.sidebar.error("List cannot be empty!")
     else:
-        new_scores = {}
-        for name in new_list: new_scores[name] = st.session_state.scores.get(name, 0)
-        st.session_state.students = new_list
-        st.session_state.scores = new_scores
-        save_data(new_list, new_scores)
-        st.session_state.groups = [] 
-        st.session_state.group_scores = {}
-        st.success("List updated!")
-        time.sleep(0.5)
-        st.rerun()
+        store_write(store.set_roster, new_list)
+        queue_feedback("List updated!")
+        rerun()
+
+with st.sidebar.expander("📥 Import Roster File"):
+    upload = st.file_uploader("CSV or JSON Lines", type=["csv", "jsonl", "ndjson"],
+                              help="One student per row, with a name column; optional score and section columns.")
+    import_section = st.text_input("Only section (optional)")
+    import_mode = st.radio("Roster", ["Replace", "Add to current"], horizontal=True)
+    if upload is not None and st.button("Import"):
+        bar = st.progress(0.0, text="Reading roster...")
+        fmt = "csv" if upload.name.lower().endswith(".csv") else "jsonl"
+        result = import_roster(upload, fmt, import_section, progress=bar.progress, total_bytes=upload.size)
+        bar.empty()
+        # Kept for the next run, which shows the new roster everywhere
+        st.session_state.import_errors = (result.error_count, result.errors)
+        if not result.students: st.session_state.import_errors = (result.error_count + 1, ["No students found in the file."] + result.errors)
+        else:
+            students = result.students
+            if import_mode == "Add to current":
+                current = set(st.session_state.students)
+                students = st.session_state.students + [name for name in students if name not in current]
+            if store_write(store.set_roster, students, result.scores):
+                queue_feedback(f"Imported {len(result.students)} students"
+                               f" ({result.duplicates} duplicates, {result.skipped} from other sections skipped).")
+        rerun()
+    error_count, errors = st.session_state.pop("import_errors", (0, []))
+    if error_count: st.warning(f"{error_count} rows skipped:\n\n" + "\n\n".join(errors))
+
+# --- 📑 TERM REPORTS ---
+# Every classroom's reports are rendered by reports.py in a child process
+# and its worker pool; this process only starts it and polls its progress.
+REPORTS_FOLDER = os.environ.get("CLASSROOM_REPORTS", "classroom_reports")
+
+@st.cache_resource
+def get_report_exports():
+    return {}   # "latest" -> reports.ExportJob, shared by every session
+
+report_exports = get_report_exports()
+
+def start_report_export():
+    job = report_exports.get("latest")
+    if job and job.running: return
+    report_exports["latest"] = ExportJob(os.path.join(REPORTS_FOLDER, time.strftime("%Y%m%d-%H%M%S")))
+
+exporting = bool(report_exports.get("latest") and report_exports["latest"].running)
+
+@st.fragment(run_every=1 if exporting else None)
+def report_progress():
+    job = report_exports.get("latest")
+    if job is None: return
+    if job.running:
+        st.progress(job.done / max(job.total, 1), text=f"📑 {job.done}/{job.total} classes · {job.students} students")
+        return
+    if job.error: st.error(f"Report export failed: {job.error}")
+    else:
+        r = job.result
+        st.caption(f"📑 {r['classrooms']} classes, {r['students']} students in {r['seconds']:.1f} s "
+                   f"({r['classrooms_per_s']:.0f} classes/s, {r['students_per_s']:.0f} students/s) → {r['out_dir']}")
+    if exporting: rerun()   # finished: a full run turns the polling off
+
+st.sidebar.markdown("---")
+st.sidebar.button("📑 Export Term Reports", on_click=start_report_export, disabled=exporting, width="stretch")
+with st.sidebar: report_progress()
 
 st.sidebar.markdown("---")
 if st.sidebar.button("⚠️ Factory Reset"):
-    if os.path.exists(DATA_FILE): os.remove(DATA_FILE)
-    st.session_state.students = DEFAULT_STUDENTS
-    st.session_state.scores = {name: 0 for name in DEFAULT_STUDENTS}
-    st.session_state.groups = []
-    st.session_state.group_scores = {}
+    store_write(store.reset)
     st.session_state.quiz_counter = 0
-    st.session_state.lying_index = 0
-    st.session_state.love_index = 0
-    st.sidebar.success("Data reset!")
-    time.sleep(0.5)
-    st.rerun()
+    for game, _ in get_question_bank(IMAGE_FOLDER).games(): st.session_state[f"{game}_index"] = 0
+    queue_feedback("Data reset!")
+    rerun()
+
+# --- 🔔 LIVE UPDATES FROM OTHER SESSIONS ---
+LIVE_UPDATE_SECONDS = 2
+
+@st.fragment(run_every=LIVE_UPDATE_SECONDS)
+def watch_classroom():
+    # Polling an int is all this costs; the app reruns only when another session changed the class
+    if store.version != st.session_state.store_version: rerun()
 
-# --- 🕒 JS INJECTION FOR TIMER ---
-def get_timer_script(end_time, is_running):
-    if not is_running:
-        return """<script>const d=window.parent.document;const e=d.getElementById('custom-floating-timer');if(e){e.remove();}</script>"""
-    return f"""
-    <script>
-        (function() {{
-            const endTime = {end_time};
-            const doc = window.parent.document;
-            let timerDiv = doc.getElementById('custom-floating-timer');
-            if (!timerDiv) {{
-                timerDiv = doc.createElement('div');
-                timerDiv.id = 'custom-floating-timer';
-                timerDiv.style.position = 'fixed';
-                timerDiv.style.bottom = '20px';
-                timerDiv.style.right = '20px';
-                timerDiv.style.background = 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)';
-                timerDiv.style.color = 'white';
-                timerDiv.style.padding = '15px 25px';
-                timerDiv.style.borderRadius = '50px';
-                timerDiv.style.fontFamily = 'Arial, sans-serif';
-                timerDiv.style.fontSize = '28px';
-                timerDiv.style.fontWeight = 'bold';
-                timerDiv.style.boxShadow = '0 4px 15px rgba(0,0,0,0.3)';
-                timerDiv.style.zIndex = '999999';
-                timerDiv.style.transition = 'transform 0.2s, background 0.5s';
-                timerDiv.innerHTML = '00:00';
-                doc.body.appendChild(timerDiv);
-            }}
-            function updateTimer() {{
-                const now = Date.now() / 1000;
-                const remaining = endTime - now;
-                if (remaining > 0) {{
-                    const m = Math.floor(remaining / 60);
-                    const s = Math.floor(remaining % 60);
-                    const text = (m < 10 ? "0" + m : m) + ":" + (s < 10 ? "0" + s : s);
-                    timerDiv.innerText = text;
-                    if (remaining < 10) {{
-                        timerDiv.style.background = 'linear-gradient(135deg, #ff416c 0%, #ff4b2b 100%)';
-                        timerDiv.style.transform = (Math.floor(remaining * 2) % 2 === 0) ? 'scale(1.1)' : 'scale(1)';
-                    }} else {{
-                        timerDiv.style.background = 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)';
-                        timerDiv.style.transform = 'scale(1)';
-                    }}
-                }} else {{
-                    timerDiv.innerText = "TIME'S UP!";
-                    timerDiv.style.background = '#e74c3c';
-                    timerDiv.style.transform = 'scale(1.2)';
-                }}
-            }}
-            if (window.myTimerInterval) clearInterval(window.myTimerInterval);
-            window.myTimerInterval = setInterval(updateTimer, 500);
-            updateTimer();
-        }})();
-    </script>
-    """
-script_html = get_timer_script(st.session_state.timer_end_time, st.session_state.timer_running)
-components.html(script_html, height=0)
+with st.sidebar: watch_classroom()
+telemetry.lap("sidebar")
 
 # --- MAIN APP CONTENT ---
 st.title("🎓 Bodies Speak Louder than Language")
 st.markdown("---")
 
-# --- HTML Generator: Seating Chart ---
-def get_seating_chart_html(student_list):
-    col_configs = [3, 4, 4, 5, 5, 5, 3] 
-    total_seats = sum(col_configs)
-    padded_students = student_list[:total_seats] + [""] * (total_seats - len(student_list))
-    students_json = json.dumps(padded_students)
-    col_config_json = json.dumps(col_configs)
-    html_code = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'Arial', sans-serif; text-align: center; margin: 0; background-color: transparent; user-select: none; }}
-            .controls {{ margin-bottom: 10px; display: flex; justify-content: center; gap: 10px; align-items: center;}}
-            .hint {{ color: #666; font-size: 14px; font-style: italic; }}
-            .reset-link {{ color: #0984e3; cursor: pointer; text-decoration: underline; font-size: 14px; border: none; background: none; }}
-            .blackboard {{ width: 90%; background-color: #2d3436; color: white; margin: 0 auto 10px auto; padding: 10px; border-radius: 5px; font-size: 20px; letter-spacing: 2px; border: 4px solid #b2bec3; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }}
-            .classroom {{ display: flex; flex-direction: row; justify-content: center; gap: 10px; padding: 10px; overflow-x: auto; }}
-            .column {{ display: flex; flex-direction: column; gap: 10px; }}
-            .seat {{ width: 65px; height: 45px; background-color: #dfe6e9; border: 2px solid #b2bec3; border-radius: 8px; display: flex; align-items: center; justify-content: center; font-weight: bold; font-size: 14px; color: #2d3436; position: relative; cursor: grab; transition: transform 0.2s, box-shadow 0.2s; }}
-            .seat:hover {{ border-color: #74b9ff; }}
-            .seat:active {{ cursor: grabbing; }}
-            .seat.empty {{ background-color: #f1f2f6; color: #ccc; border: 2px dashed #dcdde1; cursor: default; }}
-            .seat.dragging {{ opacity: 0.4; border: 2px dashed #0984e3; }}
-            .seat.over {{ border: 3px solid #00b894; transform: scale(1.05); }}
-            .seat.active {{ background-color: #e17055 !important; color: white !important; border: 3px solid #d63031 !important; transform: scale(1.1); box-shadow: 0 0 15px rgba(225, 112, 85, 0.8); z-index: 10; }}
-            .seat.winner {{ background-color: #00b894 !important; color: white !important; border: 3px solid #00cec9 !important; transform: scale(1.2); animation: pulse 1s infinite; z-index: 10; }}
-            @keyframes pulse {{ 0% {{ box-shadow: 0 0 0 0 rgba(0, 184, 148, 0.7); }} 70% {{ box-shadow: 0 0 0 10px rgba(0, 184, 148, 0); }} 100% {{ box-shadow: 0 0 0 0 rgba(0, 184, 148, 0); }} }}
-            #runBtn {{ margin-top: 20px; padding: 10px 30px; font-size: 20px; background-color: #0984e3; color: white; border: none; border-radius: 5px; cursor: pointer; }}
-            #runBtn:hover {{ background-color: #74b9ff; }}
-            #runBtn:disabled {{ background-color: #ccc; cursor: not-allowed; }}
-            #winner-display {{ height: 40px; margin-top: 10px; font-size: 24px; color: #d63031; font-weight: bold; }}
-        </style>
-    </head>
-    <body>
-        <div class="blackboard">BLACKBOARD</div>
-        <div class="controls">
-            <span class="hint">💡 Drag and drop to swap seats!</span>
-            <button class="reset-link" onclick="resetToSidebarList()">🔄 Reset to Sidebar List</button>
-        </div>
-        <div class="classroom" id="classroom-container"></div>
-        <div id="winner-display"></div>
-        <button id="runBtn" onclick="startRoulette()">🎲 Start Picker</button>
-        <script>
-            const pythonStudents = {students_json};
-            const colConfig = {col_config_json};
-            let allSeats = []; 
-            let dragSrcEl = null;
-            function loadSeatOrder() {{
-                const savedOrder = localStorage.getItem('classroom_seats_v6');
-                if (savedOrder) {{ return JSON.parse(savedOrder); }}
-                return pythonStudents;
-            }}
-            function saveSeatOrder() {{
-                const currentOrder = [];
-                document.querySelectorAll('.seat').forEach(seat => {{ currentOrder.push(seat.innerText); }});
-                localStorage.setItem('classroom_seats_v6', JSON.stringify(currentOrder));
-            }}
-            function resetToSidebarList() {{
-                localStorage.removeItem('classroom_seats_v6');
-                location.reload(); 
-            }}
-            function handleDragStart(e) {{
-                this.style.opacity = '0.4';
-                dragSrcEl = this;
-                e.dataTransfer.effectAllowed = 'move';
-                e.dataTransfer.setData('text/html', this.innerText);
-            }}
-            function handleDragOver(e) {{ if (e.preventDefault) {{ e.preventDefault(); }} e.dataTransfer.dropEffect = 'move'; return false; }}
-            function handleDragEnter(e) {{ this.classList.add('over'); }}
-            function handleDragLeave(e) {{ this.classList.remove('over'); }}
-            function handleDrop(e) {{
-                if (e.stopPropagation) {{ e.stopPropagation(); }}
-                if (dragSrcEl !== this) {{
-                    const srcName = dragSrcEl.innerText;
-                    const destName = this.innerText;
-                    dragSrcEl.innerText = destName;
-                    this.innerText = srcName;
-                    checkEmpty(dragSrcEl);
-                    checkEmpty(this);
-                    saveSeatOrder();
-                }}
-                return false;
-            }}
-            function handleDragEnd(e) {{
-                this.style.opacity = '1';
-                allSeats.forEach(seat => {{ seat.classList.remove('over'); }});
-            }}
-            function checkEmpty(seat) {{
-                if (seat.innerText === "") {{ seat.classList.add('empty'); seat.draggable = false; }} 
-                else {{ seat.classList.remove('empty'); seat.draggable = true; }}
-            }}
-            function addDnDHandlers(seat) {{
-                if (seat.innerText !== "") {{
-                    seat.draggable = true;
-                    seat.addEventListener('dragstart', handleDragStart, false);
-                }}
-                seat.addEventListener('dragenter', handleDragEnter, false);
-                seat.addEventListener('dragover', handleDragOver, false);
-                seat.addEventListener('dragleave', handleDragLeave, false);
-                seat.addEventListener('drop', handleDrop, false);
-                seat.addEventListener('dragend', handleDragEnd, false);
-            }}
-            function initClassroom() {{
-                const container = document.getElementById('classroom-container');
-                const studentList = loadSeatOrder(); 
-                let studentIndex = 0;
-                allSeats = []; 
-                colConfig.forEach((seatsInCol) => {{
-                    const colDiv = document.createElement('div');
-                    colDiv.className = 'column';
-                    for (let i = 0; i < seatsInCol; i++) {{
-                        const seatDiv = document.createElement('div');
-                        seatDiv.className = 'seat';
-                        const name = studentList[studentIndex] || "";
-                        seatDiv.innerText = name;
-                        checkEmpty(seatDiv);
-                        addDnDHandlers(seatDiv);
-                        if (name !== "") {{ seatDiv.id = 'seat-' + studentIndex; }}
-                        allSeats.push(seatDiv);
-                        colDiv.appendChild(seatDiv);
-                        studentIndex++;
-                    }}
-                    container.appendChild(colDiv);
-                }});
-            }}
-            function startRoulette() {{
-                const activeSeats = allSeats.filter(s => s.innerText !== "");
-                if (activeSeats.length === 0) return;
-                const btn = document.getElementById('runBtn');
-                const winDisplay = document.getElementById('winner-display');
-                btn.disabled = true;
-                winDisplay.innerText = "Picking a lucky student...";
-                activeSeats.forEach(s => s.classList.remove('active', 'winner'));
-                let steps = 0;
-                const totalSteps = 30 + Math.floor(Math.random() * 10); 
-                let currentSpeed = 50; 
-                let currentIndex = Math.floor(Math.random() * activeSeats.length);
-                function nextStep() {{
-                    activeSeats.forEach(s => s.classList.remove('active'));
-                    currentIndex = (currentIndex + 1) % activeSeats.length;
-                    const currentSeat = activeSeats[currentIndex];
-                    currentSeat.classList.add('active');
-                    steps++;
-                    if (steps < totalSteps) {{
-                        const remaining = totalSteps - steps;
-                        if (remaining < 15) {{
-                            if (remaining < 5) {{ currentSpeed += 150; }} else {{ currentSpeed += 40; }}
-                        }}
-                        setTimeout(nextStep, currentSpeed);
-                    }} else {{
-                        finalize(currentSeat);
-                    }}
-                }}
-                nextStep();
-            }}
-            function finalize(seat) {{
-                seat.classList.remove('active');
-                seat.classList.add('winner');
-                document.getElementById('winner-display').innerText = "🎉 " + seat.innerText + " 🎉";
-                document.getElementById('runBtn').disabled = false;
-            }}
-            initClassroom();
-        </script>
-    </body>
-    </html>
-    """
-    return html_code
+# --- 🧩 PATCHED COMPONENTS ---
+# The seating chart and the group battle travel the same way: the full state
+# once, then [index, value] patches against the version the browser holds.
+# What was last sent lives in session state under the component's "sent" key;
+# dropping it (an eviction or a "resync" event) sends the full state again.
+PATCHED_VIEW_JS = """
+function applyData(view, data, setTriggerValue) {
+    if (data.full) {
+        view.version = data.version;
+        view.render(data);
+    } else if (data.base === view.version) {
+        view.applyPatch(data.ops);
+        view.version = data.version;
+    } else if (data.version !== view.version) {
+        setTriggerValue('resync', view.version);   // remounted or missed a patch
+    }
+}
+"""
+
+def patched_data(sent_key, shape, values, full_fields, **fields):
+    """Component data for this run: `values` in full when `shape` changed, else patches only."""
+    sent = st.session_state.get(sent_key)
+    if sent is None or sent["shape"] != shape:
+        version = 1 if sent is None else sent["version"] + 1
+        st.session_state[sent_key] = {"version": version, "shape": shape, "values": values}
+        return {"version": version, "full": values, **full_fields, **fields}
+    ops = [[i, value] for i, (old, value) in enumerate(zip(sent["values"], values)) if old != value]
+    if not ops: return {"version": sent["version"], **fields}
+    base = sent["version"]
+    sent.update(version=base + 1, values=values)
+    return {"version": base + 1, "base": base, "ops": ops, **fields}
+
+def sent_values(sent_key):
+    """The values the browser was last sent, to record changes it already shows; None after an eviction."""
+    sent = st.session_state.get(sent_key)
+    return None if sent is None else sent["values"]
+
+# --- 🪑 COMPONENT: SEATING CHART ---
+# The chart's HTML/CSS/JS is static and registered once per process. The seat
+# map itself lives in the ClassroomStore, so every screen showing the class
+# agrees on it. It travels as component data: the full seat list on first
+# mount, and afterwards only [seat index, name] patches against the version
+# the browser already holds, so the mounted chart (and a roulette in
+# progress) survives reruns. A drag sends back just the swap.
+#
+# Layouts are data. A preset gives either "columns" (seats per column, filled
+# column by column like the original classroom) or "rows" x "cols" with
+# "aisles" (column indexes an aisle sits before), filled front row first.
+# Seats are drawn on one <canvas> with a single set of pointer listeners, so
+# a 400-seat hall costs no more DOM than a 29-seat room.
+SEAT_LAYOUTS = {
+    "Classroom (29 seats)": {"columns": [3, 4, 4, 5, 5, 5, 3], "seat": [65, 45], "font": 14},
+    "Seminar Room (48 seats)": {"rows": 6, "cols": 8, "aisles": [4], "seat": [65, 40], "font": 13},
+    "Lecture Hall (200 seats)": {"rows": 10, "cols": 20, "aisles": [5, 15], "seat": [54, 30], "font": 11},
+    "Lecture Hall (400 seats)": {"rows": 16, "cols": 25, "aisles": [6, 19], "seat": [46, 26], "font": 10},
+}
+
+def layout_positions(layout):
+    """Grid (x, y) of every seat in fill order; aisles become empty grid columns."""
+    if "columns" in layout:
+        return [[x, y] for x, height in enumerate(layout["columns"]) for y in range(height)]
+    aisles = sorted(layout.get("aisles", []))
+    xs = [c + sum(1 for a in aisles if a <= c) for c in range(layout["cols"])]
+    return [[xs[c], r] for r in range(layout["rows"]) for c in range(layout["cols"])]
+
+def default_layout(student_count):
+    """Smallest preset that seats everyone (the largest one if none does)."""
+    fitting = [name for name, layout in SEAT_LAYOUTS.items() if len(layout_positions(layout)) >= student_count]
+    return min(fitting, key=lambda name: len(layout_positions(SEAT_LAYOUTS[name]))) if fitting else list(SEAT_LAYOUTS)[-1]
+
+SEATING_CHART_CSS = """
+.seating-chart { font-family: 'Arial', sans-serif; text-align: center; margin: 0; background-color: transparent; user-select: none; }
+.controls { margin-bottom: 10px; display: flex; justify-content: center; gap: 10px; align-items: center;}
+.hint { color: #666; font-size: 14px; font-style: italic; }
+.reset-link { color: #0984e3; cursor: pointer; text-decoration: underline; font-size: 14px; border: none; background: none; }
+.blackboard { width: 90%; background-color: #2d3436; color: white; margin: 0 auto 10px auto; padding: 10px; border-radius: 5px; font-size: 20px; letter-spacing: 2px; border: 4px solid #b2bec3; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }
+.classroom { padding: 10px; overflow: auto; max-height: 640px; }
+.classroom canvas { display: block; margin: 0 auto; touch-action: none; cursor: grab; }
+.classroom canvas.dragging { cursor: grabbing; }
+.run-btn { margin-top: 20px; padding: 10px 30px; font-size: 20px; background-color: #0984e3; color: white; border: none; border-radius: 5px; cursor: pointer; }
+.run-btn:hover { background-color: #74b9ff; }
+.run-btn:disabled { background-color: #ccc; cursor: not-allowed; }
+.winner-display { height: 40px; margin-top: 10px; font-size: 24px; color: #d63031; font-weight: bold; }
+"""
+
+SEATING_CHART_HTML = """
+<div class="seating-chart">
+    <div class="blackboard">BLACKBOARD</div>
+    <div class="controls">
+        <span class="hint">💡 Drag and drop to swap seats!</span>
+        <button class="reset-link">🔄 Reset to Sidebar List</button>
+    </div>
+    <div class="classroom"><canvas></canvas></div>
+    <div class="winner-display"></div>
+    <button class="run-btn">🎲 Start Picker</button>
+</div>
+"""
+
+SEATING_CHART_JS = PATCHED_VIEW_JS + """
+const GAP = 10, PAD = 6;
+const STYLES = {
+    seat:   { fill: '#dfe6e9', stroke: '#b2bec3', text: '#2d3436', width: 2 },
+    empty:  { fill: '#f1f2f6', stroke: '#dcdde1', text: '#ccc', width: 2, dash: [4, 3] },
+    hover:  { fill: '#dfe6e9', stroke: '#74b9ff', text: '#2d3436', width: 2 },
+    source: { fill: '#f1f2f6', stroke: '#0984e3', text: '#b2bec3', width: 2, dash: [4, 3] },
+    over:   { fill: '#dfe6e9', stroke: '#00b894', text: '#2d3436', width: 3 },
+    active: { fill: '#e17055', stroke: '#d63031', text: 'white', width: 3 },
+    winner: { fill: '#00b894', stroke: '#00cec9', text: 'white', width: 3 },
+};
+
+function createChart(root, send) {
+    const canvas = root.querySelector('canvas');
+    const ctx = canvas.getContext('2d');
+    const winDisplay = root.querySelector('.winner-display');
+    const runBtn = root.querySelector('.run-btn');
+    const chart = { version: null, layout: null, names: [] };
+    let cellToSeat = new Map();               // "x,y" -> seat index, for O(1) hit tests
+    let hover = -1, dragFrom = -1, dropOn = -1, active = -1, winner = -1;
+
+    function seatStyle(i) {
+        if (i === winner) return STYLES.winner;
+        if (i === active) return STYLES.active;
+        if (i === dragFrom) return STYLES.source;
+        if (i === dropOn) return STYLES.over;
+        if (chart.names[i] === "") return STYLES.empty;
+        return i === hover ? STYLES.hover : STYLES.seat;
+    }
+    // Redraws one seat only: drags, hovers and roulette steps touch 1-2 seats.
+    function drawSeat(i) {
+        if (i < 0) return;
+        const [w, h] = chart.layout.seat, [x, y] = chart.layout.seats[i];
+        const px = PAD + x * (w + GAP), py = PAD + y * (h + GAP);
+        const s = seatStyle(i);
+        ctx.clearRect(px - 4, py - 4, w + 8, h + 8);
+        ctx.beginPath();
+        ctx.roundRect(px, py, w, h, 8);
+        ctx.fillStyle = s.fill;
+        ctx.fill();
+        ctx.setLineDash(s.dash || []);
+        ctx.lineWidth = s.width;
+        ctx.strokeStyle = s.stroke;
+        ctx.stroke();
+        const name = chart.names[i];
+        if (name) {
+            ctx.fillStyle = s.text;
+            ctx.fillText(name, px + w / 2, py + h / 2, w - 6);
+        }
+    }
+    function drawAll() { for (let i = 0; i < chart.names.length; i++) drawSeat(i); }
+
+    chart.render = function (data) {
+        chart.layout = data.layout;
+        chart.pickSeq = data.pick[0];   // don't replay a pick made before we mounted
+        const [w, h] = chart.layout.seat;
+        const seats = chart.layout.seats;
+        cellToSeat = new Map(seats.map(([x, y], i) => [x + ',' + y, i]));
+        const cols = Math.max(...seats.map(p => p[0])) + 1, rows = Math.max(...seats.map(p => p[1])) + 1;
+        const cssW = 2 * PAD + cols * (w + GAP) - GAP, cssH = 2 * PAD + rows * (h + GAP) - GAP;
+        const dpr = window.devicePixelRatio || 1;
+        canvas.width = cssW * dpr; canvas.height = cssH * dpr;
+        canvas.style.width = cssW + 'px'; canvas.style.height = cssH + 'px';
+        ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+        ctx.font = 'bold ' + chart.layout.font + 'px Arial, sans-serif';
+        ctx.textAlign = 'center'; ctx.textBaseline = 'middle';
+        chart.names = data.full.slice();
+        hover = dragFrom = dropOn = active = winner = -1;
+        drawAll();
+    };
+
+    chart.applyPatch = function (ops) {
+        ops.forEach(([index, name]) => {
+            chart.names[index] = name;
+            if (index === winner) { winner = -1; winDisplay.innerText = ""; }
+            drawSeat(index);
+        });
+    };
+
+    function seatAt(e) {
+        const rect = canvas.getBoundingClientRect();
+        const [w, h] = chart.layout.seat;
+        const mx = e.clientX - rect.left - PAD, my = e.clientY - rect.top - PAD;
+        const x = Math.floor(mx / (w + GAP)), y = Math.floor(my / (h + GAP));
+        if (mx - x * (w + GAP) > w || my - y * (h + GAP) > h) return -1;   // in a gap
+        const i = cellToSeat.get(x + ',' + y);
+        return i === undefined ? -1 : i;
+    }
+    function setMarker(which, i) {
+        const prev = which === 'hover' ? hover : dropOn;
+        if (prev === i) return;
+        if (which === 'hover') hover = i; else dropOn = i;
+        drawSeat(prev); drawSeat(i);
+    }
+
+    // Event delegation: one set of listeners on the canvas for every seat.
+    canvas.addEventListener('pointerdown', (e) => {
+        const i = seatAt(e);
+        if (i < 0 || chart.names[i] === "" || runBtn.disabled) return;   // no swaps mid-roulette
+        dragFrom = i;
+        canvas.setPointerCapture(e.pointerId);
+        canvas.classList.add('dragging');
+        drawSeat(i);
+    });
+    canvas.addEventListener('pointermove', (e) => {
+        const i = seatAt(e);
+        if (dragFrom >= 0) setMarker('over', i === dragFrom ? -1 : i);
+        else setMarker('hover', i);
+    });
+    canvas.addEventListener('pointerup', (e) => {
+        if (dragFrom < 0) return;
+        const src = dragFrom, dest = seatAt(e);
+        dragFrom = -1;
+        setMarker('over', -1);
+        canvas.classList.remove('dragging');
+        if (dest >= 0 && dest !== src) {
+            // Swap right away; the server confirms, or patches it back if
+            // another screen moved one of these students first.
+            const names = [chart.names[src], chart.names[dest]];
+            [chart.names[src], chart.names[dest]] = [names[1], names[0]];
+            send('swap', { a: src, b: dest, names });
+            drawSeat(dest);
+        }
+        drawSeat(src);
+    });
+    canvas.addEventListener('pointerleave', () => { if (dragFrom < 0) setMarker('hover', -1); });
+
+    root.querySelector('.reset-link').addEventListener('click', () => send('reset', Date.now()));
+
+    function finalize(seat, name) {
+        active = -1;
+        winner = seat;
+        drawSeat(seat);
+        winDisplay.innerText = "🎉 " + name + " 🎉";
+        runBtn.disabled = false;
+    }
+    // The server draws (and records) the pick; the roulette only replays it,
+    // on every screen showing this class.
+    runBtn.addEventListener('click', () => {
+        if (!chart.names.some((name) => name !== "")) return;
+        runBtn.disabled = true;
+        winDisplay.innerText = "Picking a lucky student...";
+        send('pick', Date.now());
+    });
+    chart.showPick = function (name) {
+        const lastWinner = winner;
+        winner = -1;
+        drawSeat(lastWinner);
+        const activeSeats = [];
+        chart.names.forEach((n, i) => { if (n !== "") activeSeats.push(i); });
+        const target = activeSeats.indexOf(chart.names.indexOf(name));
+        if (target < 0) { finalize(-1, name); return; }   // picked but not seated in this room
+        runBtn.disabled = true;
+        winDisplay.innerText = "Picking a lucky student...";
+        let steps = 0;
+        const totalSteps = 30 + Math.floor(Math.random() * 10);
+        let currentSpeed = 50;
+        // Start so that the last step lands on the server's choice
+        let currentIndex = ((target - totalSteps) % activeSeats.length + activeSeats.length) % activeSeats.length;
+        function nextStep() {
+            const prev = active;
+            currentIndex = (currentIndex + 1) % activeSeats.length;
+            active = activeSeats[currentIndex];
+            drawSeat(prev); drawSeat(active);
+            steps++;
+            if (steps < totalSteps) {
+                const remaining = totalSteps - steps;
+                if (remaining < 15) {
+                    if (remaining < 5) { currentSpeed += 150; } else { currentSpeed += 40; }
+                }
+                setTimeout(nextStep, currentSpeed);
+            } else {
+                finalize(active, name);
+            }
+        }
+        nextStep();
+    };
+    return chart;
+}
+
+export default function (component) {
+    const { data, parentElement, setTriggerValue } = component;
+    const root = parentElement.querySelector('.seating-chart');
+    // Called again on every data change; the chart object lives on the DOM node.
+    if (!root.chart) root.chart = createChart(root, setTriggerValue);
+    const chart = root.chart;
+    applyData(chart, data, setTriggerValue);
+    if (data.pick[0] !== chart.pickSeq) {
+        chart.pickSeq = data.pick[0];
+        if (data.pick[1] !== null) chart.showPick(data.pick[1]);
+    }
+}
+"""
+
+@st.cache_resource
+def get_seating_chart_component():
+    return components_v2.component("seating_chart", html=SEATING_CHART_HTML, css=SEATING_CHART_CSS, js=SEATING_CHART_JS)
+
+def resync_seating_chart():
+    st.session_state.pop("seat_chart_sent", None)
+
+def swap_seats():
+    swap = st.session_state.seating_chart.swap
+    if not swap: return
+    wake_for_callback()
+    a, b, names = swap["a"], swap["b"], swap["names"]
+    sent = sent_values("seat_chart_sent")
+    if sent is not None:
+        if not (0 <= a < len(sent) and 0 <= b < len(sent)): return
+        # The browser has already swapped; record that so the next diff either
+        # finds nothing to send or patches it back if the store refused.
+        sent[a], sent[b] = sent[b], sent[a]
+    store_write(store.swap_seats, a, b, names)
+
+def reset_seats():
+    store_write(store.reset_seats)
+
+PICK_MODES = {"equal": "Equal chance", "fewer_picks": "Fewer recent picks first", "low_score": "Lower scores first"}
+
+def pick_student():
+    store_write(store.pick, st.session_state.get("pick_mode", "equal"), st.session_state.session_id)
+
+def change_seat_layout():
+    wake_for_callback()
+    layout_name = st.session_state.seat_layout_pick
+    capacity = len(layout_positions(SEAT_LAYOUTS.get(layout_name) or SEAT_LAYOUTS[default_layout(len(st.session_state.students))]))
+    store_write(store.set_seat_layout, layout_name, capacity)
+
+def seating_chart_data(seat_map, layout_name, last_pick):
+    """Component data for this run: the full chart once, then patches only."""
+    layout = SEAT_LAYOUTS[layout_name]
+    positions = layout_positions(layout)
+    total_seats = len(positions)
+    seats = seat_map[:total_seats] + [""] * (total_seats - len(seat_map))
+    return patched_data("seat_chart_sent", layout_name, seats,
+                        {"layout": {"seats": positions, "seat": layout["seat"], "font": layout["font"]}}, pick=last_pick)
+
+# --- ⚔️ COMPONENT: GROUP BATTLE ---
+# Every group card is drawn by one component, like the seating chart: the
+# full battle (groups and scores) once, then [group index, score] patches.
+# The cards share one click listener; clicks show up at once and go back in
+# batches, [[group index, points], ...] every BATTLE_FLUSH_MS of quiet, as
+# one "add" event, so a 150-group battle costs one element and one write
+# per burst instead of 150 buttons rebuilt on every rerun.
+BATTLE_FLUSH_MS = 300
+
+GROUP_BATTLE_CSS = """
+.battle { display: grid; grid-template-columns: repeat(auto-fill, minmax(220px, 1fr)); gap: 12px; font-family: sans-serif; }
+.group-card { background-color: #fff; padding: 15px; border-radius: 10px; border: 2px solid #d1d5db; text-align: center; box-shadow: 0 2px 5px rgba(0,0,0,0.05); }
+.group-title { font-size: 20px; font-weight: bold; color: #2c3e50; margin-bottom: 5px; }
+.group-score { font-size: 36px; font-weight: 900; color: #e74c3c; margin: 5px 0; }
+.group-score.pending { color: #e17055; }
+.group-members { color: #555; font-size: 14px; min-height: 40px; border-top: 1px dashed #eee; padding-top: 5px; }
+.add-btn { width: 100%; margin-top: 8px; padding: 8px; font-size: 16px; border: 1px solid #d1d5db; border-radius: 8px; background: #fff; cursor: pointer; }
+.add-btn:hover { border-color: #e74c3c; color: #e74c3c; }
+"""
+
+GROUP_BATTLE_JS = PATCHED_VIEW_JS + """
+function createBattle(root, send, flushMs) {
+    const battle = { version: null, scores: [], cards: [] };
+    const pending = new Map();   // group index -> clicks not sent yet
+    let timer = 0;
+
+    function show(i) {
+        const extra = pending.get(i) || 0;
+        const el = battle.cards[i];
+        el.textContent = (battle.scores[i] + extra) + " pts";
+        el.classList.toggle('pending', extra > 0);
+    }
+    battle.render = function (data) {
+        const groups = data.groups;
+        const html = groups.map((members, i) => (
+            '<div class="group-card"><div class="group-title">🛡️ Group ' + (i + 1) + '</div>' +
+            '<div class="group-score"></div><div class="group-members"></div>' +
+            '<button class="add-btn" data-group="' + i + '">➕ Add Point to G' + (i + 1) + '</button></div>'));
+        root.innerHTML = html.join('');
+        battle.cards = Array.from(root.querySelectorAll('.group-score'));
+        root.querySelectorAll('.group-members').forEach((el, i) => { el.textContent = groups[i].join(', '); });
+        battle.scores = data.full.slice();
+        pending.clear();
+        battle.cards.forEach((_, i) => show(i));
+    };
+    battle.applyPatch = function (ops) {
+        ops.forEach(([i, score]) => { battle.scores[i] = score; show(i); });
+    };
+    function flush() {
+        timer = 0;
+        if (!pending.size) return;
+        const points = Array.from(pending);
+        // The server counts these as shown; its next patch corrects them if it disagrees.
+        points.forEach(([i, n]) => { battle.scores[i] += n; });
+        pending.clear();
+        points.forEach(([i]) => show(i));
+        send('add', points);
+    }
+    // Event delegation: one listener for every card's button.
+    root.addEventListener('click', (e) => {
+        const btn = e.target.closest('.add-btn');
+        if (!btn) return;
+        const i = Number(btn.dataset.group);
+        pending.set(i, (pending.get(i) || 0) + 1);
+        show(i);
+        clearTimeout(timer);
+        timer = setTimeout(flush, flushMs);
+    });
+    return battle;
+}
+
+export default function (component) {
+    const { data, parentElement, setTriggerValue } = component;
+    const root = parentElement.querySelector('.battle');
+    if (!root.battle) root.battle = createBattle(root, setTriggerValue, data.flush_ms);
+    applyData(root.battle, data, setTriggerValue);
+}
+"""
+
+@st.cache_resource
+def get_group_battle_component():
+    return components_v2.component("group_battle", html='<div class="battle"></div>', css=GROUP_BATTLE_CSS, js=GROUP_BATTLE_JS)
+
+def resync_group_battle():
+    st.session_state.pop("battle_sent", None)
+
+def add_group_points():
+    points = st.session_state.group_battle_cards.add
+    if not points: return
+    wake_for_callback()
+    points = [(i, n) for i, n in points if n > 0]
+    sent = sent_values("battle_sent")
+    if sent is not None:
+        # The browser already shows these; the next diff only sends corrections
+        for i, n in points:
+            if 0 <= i < len(sent): sent[i] += n
+    store_write(store.add_group_points, points, st.session_state.session_id)
+
+def group_battle_data(groups, group_scores):
+    """Component data for this run: the whole battle once, then score patches only."""
+    scores = [group_scores.get(i, 0) for i in range(len(groups))]
+    return patched_data("battle_sent", groups, scores, {"groups": groups}, flush_ms=BATTLE_FLUSH_MS)
+
+# --- 📤 EXPORT ---
+def export_scoreboard_csv(ranking):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["Rank", "Name", "Score"])
+    writer.writerows(ranking)
+    return buf.getvalue().encode("utf-8")
 
 # --- Tabs ---
 tab_pic, tab_seat, tab_group, tab_score = st.tabs(["🖼️ Look & Say", "🪑 Seating Chart", "⚔️ Group Battle", "🏆 Scoreboard"])
 
+# --- 🧩 FRAGMENTS ---
+# Each panel below is an st.fragment, so its buttons rerun that panel only
+# instead of the whole script (CSS, timer, seating chart and all four tabs).
+def rerun_fragment():
+    # A fragment's widgets can still fire during a full run (e.g. under AppTest),
+    # where a fragment-scoped rerun is not allowed
+    try: st.rerun(scope="fragment")
+    except StreamlitAPIException: rerun()
+
 # === Tab 0: Look & Say ===
+@st.fragment
+@telemetry.timed("quiz_game", fragment_session)
+def quiz_game(game):
+    wake_fragment()
+    flush_feedback()
+    for suffix, default in (("image", None), ("image_name", ""), ("index", 0)):
+        st.session_state.setdefault(f"{game}_{suffix}", default)
+    bank = get_question_bank(IMAGE_FOLDER)
+    col_img, col_opt = st.columns([1.5, 1])
+
+    with col_img:
+        if st.session_state[f"{game}_image"]:
+            st.image(quiz_image_src(st.session_state[f"{game}_image"]), use_container_width=True)
+            prefetch_upcoming(game)
+        else:
+            st.info("👋 Welcome! Click 'Start' to begin.")
+
+    with col_opt:
+        if st.button("📸 Start / Next Image", key=f"btn_pick_{game}", use_container_width=True, type="primary"):
+            # Sequential Loop
+            pick_next_image(game)
+            rerun_fragment()
+
+        current_name = st.session_state[f"{game}_image_name"]
+        question = bank.lookup(game, current_name) if current_name else None
+        if question:
+            st.markdown('<div class="sentence-box">', unsafe_allow_html=True)
+            st.markdown(f'<div class="sentence-title">{html.escape(question.question)}</div>', unsafe_allow_html=True)
+
+            choice = st.radio(
+                "Options",
+                range(len(question.options)),
+                format_func=question.options.__getitem__,
+                key=f"radio_{game}_{current_name.lower()}_{st.session_state.quiz_counter}",
+                index=None, label_visibility="collapsed"
+            )
+
+            if choice is not None:
+                if bank.check(question, choice):
+                    queue_feedback("Correct!", balloons=True)
+                    st.session_state.quiz_counter += 1
+                    pick_next_image(game)
+                    rerun_fragment()
+                else:
+                    st.warning("🤔 Not quite — look again and try another answer!")
+            st.markdown('</div>', unsafe_allow_html=True)
+
 with tab_pic:
     st.header("🖼️ Look & Say Games")
-    
-    stab_lie, stab_love = st.tabs(["🤥 The Lying Game", "😍 The Love Game"])
-
-    # ====== GAME 1: LYING ======
-    with stab_lie:
-        st.subheader("🤥 The Lying Game")
-        
-        col_img, col_opt = st.columns([1.5, 1])
-        
-        with col_img:
-            if st.session_state.lying_image:
-                st.image(st.session_state.lying_image, use_container_width=True)
-            else:
-                st.info("👋 Welcome! Click 'Start' to begin.")
-                
-        with col_opt:
-            if st.button("📸 Start / Next Image", key="btn_pick_lie", use_container_width=True, type="primary"):
-                # Sequential Loop
-                pick_next_image(["lie", "lying"], "lying")
-                st.rerun()
-            
-            if st.session_state.lying_image:
-                current_name_l = st.session_state.lying_image_name.lower()
-                st.markdown('<div class="sentence-box">', unsafe_allow_html=True)
-                st.markdown('<div class="sentence-title">🤔 What is the sign of lying?</div>', unsafe_allow_html=True)
-                
-                lying_options = [
-                    "Making stiff body movements",
-                    "Making eye movements",
-                    "Touching or scratching themselves"
-                ]
-                
-                selection_l = st.radio(
-                    "Options", 
-                    lying_options, 
-                    key=f"radio_lie_{current_name_l}_{st.session_state.quiz_counter}", 
-                    index=None, label_visibility="collapsed"
-                )
-                
-                if selection_l:
-                    st.success("✅ Correct!")
-                    st.balloons()
-                    st.session_state.quiz_counter += 1 
-                    time.sleep(1.0)
-                    pick_next_image(["lie", "lying"], "lying")
-                    st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
-
-    # ====== GAME 2: LOVE ======
-    with stab_love:
-        st.subheader("😍 The Love Game")
-        
-        col_img_v, col_opt_v = st.columns([1.5, 1])
-        
-        with col_img_v:
-            if st.session_state.love_image:
-                st.image(st.session_state.love_image, use_container_width=True)
-            else:
-                st.info("👋 Welcome! Click 'Start' to begin.")
-        
-        with col_opt_v:
-            if st.button("📸 Start / Next Image", key="btn_pick_love", use_container_width=True, type="primary"):
-                pick_next_image("love", "love") 
-                st.rerun()
-                
-            if st.session_state.love_image:
-                current_name_v = st.session_state.love_image_name.lower()
-                st.markdown('<div class="sentence-box">', unsafe_allow_html=True)
-                st.markdown('<div class="sentence-title">🥰 What is the sign of attraction?</div>', unsafe_allow_html=True)
-                
-                love_options = [
-                    "Their eyes do the talking.",
-                    "They copy the person's actions.",
-                    "They point their shoulders toward the person or try to get closer."
-                ]
-                
-                selection_v = st.radio(
-                    "Options", 
-                    love_options, 
-                    key=f"radio_love_{current_name_v}_{st.session_state.quiz_counter}", 
-                    index=None, label_visibility="collapsed"
-                )
-                
-                if selection_v:
-                    st.success("✅ Correct!")
-                    st.balloons()
-                    st.session_state.quiz_counter += 1 
-                    time.sleep(1.0)
-                    pick_next_image("love", "love")
-                    st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
+    bank = get_question_bank(IMAGE_FOLDER)
+    games = bank.games()
+    for problem in bank.errors: st.warning(problem)
+    for (game, title), stab in zip(games, st.tabs([title for _, title in games])):
+        with stab:
+            st.subheader(title)
+            quiz_game(game)
+telemetry.lap("tab_look_and_say")
 
 # === Tab NEW: Seating Chart ===
 with tab_seat:
@@ -579,94 +1020,174 @@ with tab_seat:
     if not st.session_state.students:
         st.error("Student list is empty! Please add names in the Settings sidebar.")
     else:
-        chart_html = get_seating_chart_html(st.session_state.students)
-        components.html(chart_html, height=600)
+        # The room is shared like the seat map; "Auto" (None) is the
+        # smallest room that fits the roster.
+        auto = default_layout(len(st.session_state.students))
+        picked = st.session_state.seat_layout if st.session_state.seat_layout in SEAT_LAYOUTS else None
+        st.session_state.seat_layout_pick = picked
+        col_room, col_pick = st.columns(2)
+        col_room.selectbox("Room Layout", [None, *SEAT_LAYOUTS], key="seat_layout_pick", on_change=change_seat_layout,
+                           format_func=lambda name: name or f"Auto ({auto})")
+        col_pick.selectbox("Picker", list(PICK_MODES), key="pick_mode", format_func=PICK_MODES.get)
+        layout_name = picked or auto
+        capacity = len(layout_positions(SEAT_LAYOUTS[layout_name]))
+        unseated = sum(1 for name in st.session_state.seats[capacity:] if name)
+        if unseated:
+            st.warning(f"⚠️ {unseated} students have no seat in this layout. Pick a larger room.")
+        get_seating_chart_component()(key="seating_chart",
+                                      data=seating_chart_data(st.session_state.seats, layout_name, st.session_state.last_pick),
+                                      on_resync_change=resync_seating_chart, on_swap_change=swap_seats,
+                                      on_reset_change=reset_seats, on_pick_change=pick_student)
+telemetry.lap("tab_seating_chart")
 
 # === Tab 2: Group Battle ===
-with tab_group:
-    st.header("⚔️ Group Battle Mode")
+@st.fragment
+@telemetry.timed("group_battle", fragment_session)
+def group_battle():
+    wake_fragment()
+    flush_feedback()
     c_gen, c_info = st.columns([1, 2])
     with c_gen:
         g_size = st.number_input("Group Size", 2, 10, 4)
         if st.button("🚀 Generate New Groups"):
-            shuffled = st.session_state.students.copy()
-            random.shuffle(shuffled)
-            groups = [shuffled[i:i + g_size] for i in range(0, len(shuffled), g_size)]
-            st.session_state.groups = groups 
-            st.session_state.group_scores = {i: 0 for i in range(len(groups))}
-            st.success("Groups generated & Scores reset!")
-            st.rerun()
+            groups = form_groups(st.session_state.students, st.session_state.scores, g_size, store.past_pairings())
+            store_write(store.start_battle, groups)
+            queue_feedback("Groups generated & Scores reset!")
+            rerun_fragment()
             
     with c_info:
         if st.session_state.groups:
             if st.button("🗑️ Reset Group Scores"):
-                st.session_state.group_scores = {i: 0 for i in range(len(st.session_state.groups))}
-                st.toast("Group scores cleared!")
-                time.sleep(0.5)
-                st.rerun()
+                store_write(store.reset_group_scores)
+                queue_feedback("Group scores cleared!", icon="🗑️")
+                rerun_fragment()
         else:
             st.info("👈 Set size and click Generate to start battle!")
 
     st.divider()
 
     if st.session_state.groups:
-        num_groups = len(st.session_state.groups)
-        cols_per_row = 3 
-        for i in range(0, num_groups, cols_per_row):
-            row_cols = st.columns(cols_per_row)
-            for j in range(cols_per_row):
-                if i + j < num_groups:
-                    group_idx = i + j
-                    group_members = st.session_state.groups[group_idx]
-                    with row_cols[j]:
-                        if group_idx not in st.session_state.group_scores:
-                            st.session_state.group_scores[group_idx] = 0
-                        g_score = st.session_state.group_scores[group_idx]
-                        st.markdown(f"""
-                        <div class="group-card">
-                            <div class="group-title">🛡️ Group {group_idx + 1}</div>
-                            <div class="group-score">{g_score} pts</div>
-                            <div class="group-members">{', '.join(group_members)}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        if st.button(f"➕ Add Point to G{group_idx + 1}", key=f"btn_g_{group_idx}", use_container_width=True):
-                            st.session_state.group_scores[group_idx] += 1
-                            st.rerun()
+        get_group_battle_component()(key="group_battle_cards",
+                                     data=group_battle_data(st.session_state.groups, st.session_state.group_scores),
+                                     on_resync_change=resync_group_battle, on_add_change=add_group_points)
+
+with tab_group:
+    st.header("⚔️ Group Battle Mode")
+    group_battle()
+telemetry.lap("tab_group_battle")
 
 # === Tab 3: Scoreboard (Individual) ===
-with tab_score:
-    st.header("🏆 Scoreboard (Individual)")
+SCOREBOARD_PAGE_SIZE = 50
+
+def score_trends(student):
+    """Points over time from the history rollups (never the raw events)."""
+    history = store.history
+    c_who, c_period = st.columns(2)
+    who = c_who.radio("Points of", ["Whole class", student], horizontal=True)
+    period = c_period.radio("Per", ["day", "week"], horizontal=True)
+    trend = history.trend(period, None if who == "Whole class" else who)
+    if trend:
+        labels, points = zip(*trend)
+        st.bar_chart({period.title(): labels, "Points": points}, x=period.title(), y="Points")
+    else: st.caption("No points recorded yet.")
+    term = history.term.most_common(10)
+    if term:
+        rows_html = "".join(f"<tr><td>{html.escape(name)}</td><td>{points}</td></tr>" for name, points in term)
+        st.markdown(f'<div class="score-table"><table><thead><tr><th>Term total (top 10)</th><th>Points</th></tr></thead><tbody>{rows_html}</tbody></table></div>', unsafe_allow_html=True)
+
+@st.fragment
+@telemetry.timed("scoreboard", fragment_session)
+def scoreboard():
+    wake_fragment()
+    flush_feedback()
     cd, ca = st.columns([2, 1])
     with ca:
         current_students = st.session_state.students
         if current_students:
+            podium = store.ranking(0, 3)
+            st.markdown("  \n".join(f"{medal} **{html.escape(name)}** ({score})" for medal, (_, name, score) in zip("🥇🥈🥉", podium)))
             sel_stu = st.selectbox("Select Student", current_students)
+            ranked = store.rank(sel_stu)
+            if ranked: st.caption(f"Rank #{ranked[0]} of {ranked[1]}")
             pts = st.number_input("Points", -10, 10, 1)
             c_update, c_clear = st.columns(2)
             with c_update:
                 if st.button("Update Score", use_container_width=True):
-                    st.session_state.scores[sel_stu] += pts
-                    save_data(st.session_state.students, st.session_state.scores)
-                    st.success(f"Updated!")
-                    time.sleep(0.5)
-                    st.rerun()
+                    store_write(store.add_points, sel_stu, pts, st.session_state.session_id)
+                    queue_feedback("Updated!")
+                    rerun_fragment()
             with c_clear:
                 if st.button("🗑️ Reset Individuals", use_container_width=True):
-                    st.session_state.scores = {name: 0 for name in st.session_state.students}
-                    save_data(st.session_state.students, st.session_state.scores)
-                    st.success("Individual scores cleared!")
-                    time.sleep(0.5)
-                    st.rerun()
+                    store_write(store.reset_scores)
+                    queue_feedback("Individual scores cleared!", icon="🗑️")
+                    rerun_fragment()
+            if store.history.last_reset() is not None and st.button("↩️ Undo Reset", width="stretch"):
+                store_write(store.undo_reset)
+                queue_feedback("Scores restored!", icon="↩️")
+                rerun_fragment()
         else: st.warning("No students available.")
     with cd:
-        score_data = [{"Name": n, "Score": st.session_state.scores.get(n, 0)} for n in st.session_state.students]
-        if score_data:
-            df = pd.DataFrame(score_data).sort_values(by='Score', ascending=False)
-            st.dataframe(df, use_container_width=True, hide_index=True)
+        # The store keeps the ranking sorted as scores change; this reads one page of it
+        total = len(st.session_state.students)
+        if total:
+            pages = (total - 1) // SCOREBOARD_PAGE_SIZE + 1
+            if st.session_state.get("score_page", 1) > pages: st.session_state.score_page = pages
+            page = st.number_input("Page", 1, pages, key="score_page", help=f"{pages} pages of {SCOREBOARD_PAGE_SIZE}") if pages > 1 else 1
+            start = (page - 1) * SCOREBOARD_PAGE_SIZE
+            rows = store.ranking(start, start + SCOREBOARD_PAGE_SIZE)
+            rows_html = "".join(f"<tr><td>{rank}</td><td>{html.escape(name)}</td><td>{score}</td></tr>" for rank, name, score in rows)
+            st.markdown(f'<div class="score-table"><table><thead><tr><th>#</th><th>Name</th><th>Score</th></tr></thead><tbody>{rows_html}</tbody></table></div>', unsafe_allow_html=True)
+            if st.button("📤 Export Scoreboard"):
+                st.download_button("⬇️ Download CSV", export_scoreboard_csv(store.ranking()), "scoreboard.csv", "text/csv")
+            # Charts load pandas, so they only render once asked for
+            if st.toggle("📈 Trends & term totals"):
+                score_trends(sel_stu)
         else:
             st.info("Scoreboard is empty.")
             if st.button("Try Loading Default Data"):
-                st.session_state.students = DEFAULT_STUDENTS
-                st.session_state.scores = {n:0 for n in DEFAULT_STUDENTS}
-                save_data(DEFAULT_STUDENTS, st.session_state.scores)
-                st.rerun()
+                store_write(store.set_roster, DEFAULT_STUDENTS)
+                rerun()
+
+with tab_score:
+    st.header("🏆 Scoreboard (Individual)")
+    scoreboard()
+telemetry.lap("tab_scoreboard")
+
+# --- 🛠️ ADMIN: PERFORMANCE (open the app with ?admin=1) ---
+if st.query_params.get("admin") == "1":
+    with st.sidebar.expander("🛠️ Performance", expanded=True):
+        spans = telemetry.spans()
+        rows_html = "".join(f"<tr><td>{html.escape(name)}</td><td>{s['p50'] * 1000:.1f}</td><td>{s['p95'] * 1000:.1f}</td><td>{s['count']}</td></tr>"
+                            for name, s in sorted(spans.items(), key=lambda item: -item[1]["p95"]))
+        st.markdown(f'<div class="score-table"><table><thead><tr><th>Span</th><th>p50 ms</th><th>p95 ms</th><th>n</th></tr></thead><tbody>{rows_html}</tbody></table></div>', unsafe_allow_html=True)
+        sessions = telemetry.sessions()
+        st.caption(f"{len(sessions)} active sessions · this one: {sessions.get(st.session_state.session_id, {}).get('full', 0)} full / "
+                   f"{sessions.get(st.session_state.session_id, {}).get('fragment', 0)} fragment reruns")
+        memory.sweep(st.session_state.session_id, force=True)
+        usage = memory.report()
+        rows_html = "".join(f"<tr><td>{r['session']}</td><td>{r['bytes'] / 1024:.0f}</td><td>{r['idle']:.0f}</td>"
+                            f"<td>{'💾' if r['spilled'] else ''}</td></tr>" for r in usage)
+        st.markdown(f'<div class="score-table"><table><thead><tr><th>Session</th><th>KiB</th><th>Idle s</th><th>Spilled</th></tr></thead><tbody>{rows_html}</tbody></table></div>', unsafe_allow_html=True)
+        st.caption(f"Session state: {sum(r['bytes'] for r in usage) / 1024:.0f} KiB of {memory.budget_bytes / 2**20:.0f} MiB budget · "
+                   f"{memory.evictions} evictions (measured every {memory.sweep_interval:.0f} s)")
+        coordinator = get_coordinator()
+        if coordinator:
+            st.caption(f"Replica {coordinator.id} · {len(coordinator.peers())} peers · class generation {store.generation} · "
+                       f"{coordinator.sent} sent / {coordinator.received} received")
+        report = telemetry.profile_report()
+        if report: st.code(report, language=None)
+        elif not telemetry.profile_rate: st.caption("cProfile sampling is off (set CLASSROOM_PROFILE_RATE, e.g. 0.05).")
+        if st.button("Write Prometheus File"):
+            st.caption(f"Wrote {telemetry.write_prometheus(telemetry.metrics_file or 'classroom_metrics.prom')}")
+
+# --- 🧹 STALE KEYS ---
+# Every question gets fresh widget keys; drop the ones this
+# run no longer renders, then let the memory manager sweep idle sessions.
+def collect_stale_keys():
+    live = {f"radio_{game}_{st.session_state.get(f'{game}_image_name', '').lower()}_{st.session_state.quiz_counter}"
+            for game, _ in get_question_bank(IMAGE_FOLDER).games()}
+    memory.collect(get_script_run_ctx().session_state, ("radio_",), live)
+
+collect_stale_keys()
+memory.sweep(st.session_state.session_id)
+telemetry.end_run()
@@ -0,0 +1,354 @@
+"""Benchmarks for the classroom app.
+
+    python benchmark.py startup     # cold start, with and without pandas preloaded
+    python benchmark.py reruns      # click latency: full-script rerun vs. fragment rerun
+    python benchmark.py groups      # group formation: quality vs. time
+    python benchmark.py suite -o before.json    # full matrix, machine-readable
+    python benchmark.py compare before.json after.json
+    python benchmark.py replicas    # write throughput and convergence with 1, 2, 4, 8 processes
+
+Startup samples run in a fresh interpreter so import caches don't leak
+between them.
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+COLD_START = """
+import json, sys, time
+t0 = time.perf_counter()
+{preload}
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+assert not at.exception, at.exception
+print(json.dumps({{"seconds": time.perf_counter() - t0, "pandas_loaded": "pandas" in sys.modules}}))
+"""
+
+def run_sample(code, cwd, env=None):
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True,
+                         env=None if env is None else {**os.environ, **env}).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+@contextlib.contextmanager
+def timed_fragments():
+    """Record how long each st.fragment body takes, by function name.
+
+    AppTest always executes the whole script, so fragment bodies are timed by
+    wrapping st.fragment before the app is loaded.
+    """
+    import streamlit as st
+    fragment_times = defaultdict(list)
+    real_fragment = st.fragment
+    def timed_fragment(func=None, **kwargs):
+        if func is None: return lambda f: timed_fragment(f, **kwargs)
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            t0 = time.perf_counter()
+            try: return func(*args, **kw)
+            finally: fragment_times[func.__name__].append(time.perf_counter() - t0)
+        return real_fragment(wrapper, **kwargs)
+    st.fragment = timed_fragment
+    try: yield fragment_times
+    finally: st.fragment = real_fragment
+
+@contextlib.contextmanager
+def app_workdir(tmp, env):
+    """Run in `tmp` with `env` set, so the app's data files and caches land there."""
+    cwd, saved = os.getcwd(), {k: os.environ.get(k) for k in env}
+    os.chdir(tmp)
+    os.environ.update(env)
+    try: yield
+    finally:
+        os.chdir(cwd)
+        for k, v in saved.items():
+            if v is None: os.environ.pop(k, None)
+            else: os.environ[k] = v
+
+def bench_startup(repeat):
+    """Cold start of app.py as it is now vs. with pandas imported up front (the old behavior)."""
+    results = {}
+    for label, preload in (("current", ""), ("pandas_preloaded", "import pandas")):
+        samples = []
+        for _ in range(repeat):
+            # Fresh working directory: no data files, nothing cached on disk
+            with tempfile.TemporaryDirectory() as cwd:
+                samples.append(run_sample(COLD_START.format(preload=preload, app=APP), cwd))
+        seconds = [s["seconds"] for s in samples]
+        results[label] = {"median_s": statistics.median(seconds), "min_s": min(seconds),
+                          "pandas_loaded": samples[-1]["pandas_loaded"]}
+    results["saved_s"] = results["pandas_preloaded"]["median_s"] - results["current"]["median_s"]
+    return results
+
+def button(at, label): return next(b for b in at.button if b.label == label)
+
+def component_event(at, key, event, value):
+    """Queue `event` from component `key` for the next run (AppTest can't click inside components)."""
+    from streamlit.components.v2.bidi_component.main import _make_trigger_id
+
+    component = next(e for e in at.get("bidi_component") if e.key == key)
+    states = at._tree.get_widget_states()
+    state = states.widgets.add()
+    state.id = _make_trigger_id(component.proto.id, "events")
+    state.json_trigger_value = json.dumps([{"event": event, "value": value}])
+    at._tree.get_widget_states = lambda: states   # the run replaces the tree, and this with it
+
+def bench_reruns(repeat, students):
+    """Server time per click: a full script run (what every click cost before
+    fragments) vs. the body of the fragment that now reruns on its own."""
+    from streamlit.testing.v1 import AppTest
+
+    clicks = {
+        "add_group_point": ("group_battle", lambda at: component_event(at, "group_battle_cards", "add", [[0, 1]])),
+        "update_score": ("scoreboard", lambda at: button(at, "Update Score").click()),
+        "start_timer": ("timer_panel", lambda at: button(at, "▶ Start").click()),
+    }
+    results = {"students": students}
+    with tempfile.TemporaryDirectory() as tmp, app_workdir(tmp, {}), timed_fragments() as fragment_times:
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.run()
+        at.text_area[0].set_value("\n".join(f"Student {i}" for i in range(students)))
+        button(at, "Update List").click().run()
+        button(at, "🚀 Generate New Groups").click().run()
+        for name, (fragment, click) in clicks.items():
+            full = []
+            for _ in range(repeat):
+                fragment_times.clear()
+                click(at)
+                t0 = time.perf_counter()
+                at.run()
+                full.append(time.perf_counter() - t0)
+                assert not at.exception, at.exception
+            per_call = fragment_times[fragment]
+            results[name] = {"full_rerun_ms": statistics.median(full) * 1000,
+                             "fragment_rerun_ms": statistics.median(per_call) * 1000}
+    return results
+
+def bench_groups(repeat, students, group_size, history):
+    """Random slicing (the old behavior) vs. greedy seeding alone vs. greedy
+    plus local search at a few time budgets, on a synthetic class with
+    `history` past battles."""
+    import random
+    from grouping import form_groups, group_quality, pair_counts
+
+    rng = random.Random(42)
+    names = [f"Student {i}" for i in range(students)]
+    scores = {name: int(rng.gauss(20, 8)) for name in names}
+    past = []
+    for _ in range(history):
+        shuffled = rng.sample(names, len(names))
+        past.append([shuffled[i:i + group_size] for i in range(0, len(shuffled), group_size)])
+    pairs = pair_counts(past)
+
+    def random_groups():
+        shuffled = rng.sample(names, len(names))
+        return [shuffled[i:i + group_size] for i in range(0, len(shuffled), group_size)]
+    strategies = {"random": random_groups,
+                  "greedy": lambda: form_groups(names, scores, group_size, pairs, max_swaps=0, rng=rng)}
+    for budget_ms in (5, 20, 50):
+        strategies[f"greedy+search_{budget_ms}ms"] = (
+            lambda b=budget_ms: form_groups(names, scores, group_size, pairs, budget_s=b / 1000, rng=rng))
+
+    results = {"students": students, "group_size": group_size, "history": history}
+    for label, run in strategies.items():
+        times, quality = [], []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            groups = run()
+            times.append(time.perf_counter() - t0)
+            quality.append(group_quality(groups, scores, pairs))
+        results[label] = {"median_ms": statistics.median(times) * 1000,
+                          "mean_spread": statistics.median(q["mean_spread"] for q in quality),
+                          "repeat_pairs": statistics.median(q["repeat_pairs"] for q in quality)}
+    return results
+
+def make_images(folder, count):
+    """`count` small PNGs, half for each quiz game, sharing one encoded image."""
+    from PIL import Image
+    os.makedirs(folder, exist_ok=True)
+    Image.new("RGB", (64, 48), (120, 160, 200)).save(os.path.join(folder, "lie_0.png"))
+    with open(os.path.join(folder, "lie_0.png"), "rb") as f: data = f.read()
+    for i in range(1, count):
+        with open(os.path.join(folder, f"{'lie' if i % 2 == 0 else 'love'}_{i}.png"), "wb") as f: f.write(data)
+
+def write_roster(path, students):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write("Name,Score\n" + "".join(f"Student {i},{i % 10}\n" for i in range(students)))
+
+def bench_case(repeat, students, images):
+    """One point of the suite matrix: cold start plus each tab's interactions."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Each tab's interaction, and the fragment that reruns for it (None: the whole script)
+    actions = {
+        "look_and_say.pick_next_image": ("quiz_game", lambda at: at.button(key="btn_pick_lying").click()),
+        "seating.change_layout": (None, lambda at: at.selectbox(key="seat_layout_pick").set_value(
+            None if at.selectbox(key="seat_layout_pick").value else "Lecture Hall (400 seats)")),
+        "group_battle.generate_groups": ("group_battle", lambda at: button(at, "🚀 Generate New Groups").click()),
+        "group_battle.add_point": ("group_battle", lambda at: component_event(at, "group_battle_cards", "add", [[0, 1]])),
+        "scoreboard.update_score": ("scoreboard", lambda at: button(at, "Update Score").click()),
+        "sidebar.start_timer": ("timer_panel", lambda at: button(at, "▶ Start").click()),
+    }
+    result = {"students": students, "images": images}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"CLASSROOM_IMAGES": os.path.join(tmp, "images"), "CLASSROOM_IMAGE_CACHE": os.path.join(tmp, ".image_cache"),
+               "CLASSROOM_HISTORY": os.path.join(tmp, "history")}
+        make_images(env["CLASSROOM_IMAGES"], images)
+        write_roster(os.path.join(tmp, "classroom_data.csv"), students)
+        cold = [run_sample(COLD_START.format(preload="", app=APP), tmp, env)["seconds"] for _ in range(repeat)]
+        result["cold_start_ms"] = statistics.median(cold) * 1000
+
+        st.cache_resource.clear()   # no store or catalog left over from another case
+        with app_workdir(tmp, env), timed_fragments() as fragment_times:
+            at = AppTest.from_file(APP, default_timeout=120)
+            at.run()
+            full = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                at.run()
+                full.append(time.perf_counter() - t0)
+            result["full_rerun_ms"] = statistics.median(full) * 1000
+            for name, (fragment, act) in actions.items():
+                full = []
+                for _ in range(repeat):
+                    fragment_times.clear()
+                    act(at)
+                    t0 = time.perf_counter()
+                    at.run()
+                    full.append(time.perf_counter() - t0)
+                    assert not at.exception, at.exception
+                result[name] = {"full_rerun_ms": statistics.median(full) * 1000,
+                                "fragment_ms": statistics.median(fragment_times[fragment]) * 1000 if fragment else None}
+    return result
+
+def bench_suite(repeat, roster_sizes, image_counts):
+    try: commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(APP),
+                                 capture_output=True, text=True).stdout.strip() or None
+    except OSError: commit = None
+    cases = [bench_case(repeat, students, images) for students in roster_sizes for images in image_counts]
+    return {"commit": commit, "python": sys.version.split()[0], "timestamp": time.time(), "repeat": repeat, "cases": cases}
+
+def flatten(case, prefix=""):
+    for key, value in case.items():
+        if isinstance(value, dict): yield from flatten(value, f"{prefix}{key}.")
+        elif key.endswith("_ms") and value is not None: yield prefix + key, value
+
+def compare(before_file, after_file, threshold):
+    """Per-metric change between two suite runs; True if nothing got slower than `threshold`."""
+    with open(before_file) as f: before = {(c["students"], c["images"]): dict(flatten(c)) for c in json.load(f)["cases"]}
+    with open(after_file) as f: after = {(c["students"], c["images"]): dict(flatten(c)) for c in json.load(f)["cases"]}
+    ok = True
+    for key in sorted(before.keys() & after.keys()):
+        for metric, old in before[key].items():
+            new = after[key].get(metric)
+            if new is None or not old: continue
+            change = new / old - 1
+            flag = "SLOWER" if change > threshold else ""
+            ok = ok and not flag
+            print(f"students={key[0]:<5} images={key[1]:<6} {metric:<45} {old:9.1f} -> {new:9.1f} ms {change:+7.1%} {flag}")
+    return ok
+
+REPLICA_ROSTER = [f"Student {i}" for i in range(30)]
+
+def open_replica(tmp, backend):
+    """A coordinated ClassroomStore in `tmp`, the way each app process opens one."""
+    from classroom import ClassroomStore
+    from history import ScoreHistory
+    from replicas import Coordinator
+    from storage import DEFAULT_CLASSROOM, CsvStorage, SqliteStorage
+    os.chdir(tmp)
+    storage = SqliteStorage("classroom.db") if backend == "sqlite" else CsvStorage()
+    coordinator = Coordinator(os.path.join(tmp, "coordination"), poll_interval=0.2)
+    history = ScoreHistory(os.path.join(tmp, "history"), DEFAULT_CLASSROOM)
+    return ClassroomStore(storage, DEFAULT_CLASSROOM, REPLICA_ROSTER, history, coordinator)
+
+def replica_worker(tmp, backend, start_at, seconds):
+    store = open_replica(tmp, backend)
+    time.sleep(max(start_at - time.time(), 0))
+    writes, deadline = 0, start_at + seconds
+    while time.time() < deadline:
+        store.add_points(REPLICA_ROSTER[writes % len(REPLICA_ROSTER)], 1, "bench")
+        writes += 1
+    time.sleep(1.0)   # let the last announcements arrive
+    total = sum(store.snapshot()[2].values())
+    return {"writes": writes, "seen_total": total, "received": store.coordinator.received}
+
+def bench_replicas(process_counts, seconds, backend):
+    """Aggregate score-write throughput with N coordinated processes hammering
+    one classroom, and whether every replica converges on the same totals."""
+    import multiprocessing
+    results = {"backend": backend, "seconds": seconds}
+    ctx = multiprocessing.get_context("spawn")
+    for n in process_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            try: open_replica(tmp, backend).coordinator.close()   # creates the roster up front
+            finally: os.chdir(cwd)
+            with ctx.Pool(n) as pool:
+                start_at = time.time() + 2.0   # after every worker has started
+                runs = pool.starmap(replica_worker, [(tmp, backend, start_at, seconds)] * n)
+            try: final = sum(open_replica(tmp, backend).snapshot()[2].values())
+            finally: os.chdir(cwd)
+        writes = sum(r["writes"] for r in runs)
+        results[f"{n}_processes"] = {"writes_per_s": writes / seconds, "writes": writes, "stored_total": final,
+                                     "converged": final == writes and all(r["seen_total"] == writes for r in runs),
+                                     "announcements_received": sum(r["received"] for r in runs)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("startup", help="cold start time of app.py")
+    p.add_argument("--repeat", type=int, default=5)
+    p = sub.add_parser("reruns", help="click latency with and without fragments")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--students", type=int, default=30)
+    p = sub.add_parser("groups", help="group formation quality vs. time")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--students", type=int, default=500)
+    p.add_argument("--group-size", type=int, default=4)
+    p.add_argument("--history", type=int, default=5)
+    p = sub.add_parser("suite", help="cold start and per-tab reruns over roster and image-folder sizes")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--students", type=int, nargs="+", default=[30, 300, 3000])
+    p.add_argument("--images", type=int, nargs="+", default=[10, 10000])
+    p.add_argument("-o", "--output", help="write the JSON here instead of stdout")
+    p = sub.add_parser("compare", help="compare two suite JSON files")
+    p.add_argument("before")
+    p.add_argument("after")
+    p.add_argument("--threshold", type=float, default=0.2, help="flag metrics this much slower (0.2 = 20%%)")
+    p = sub.add_parser("replicas", help="write throughput and convergence across coordinated processes")
+    p.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--backend", choices=("sqlite", "csv"), default="sqlite")
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        print(json.dumps(bench_startup(args.repeat), indent=2))
+    elif args.command == "reruns":
+        print(json.dumps(bench_reruns(args.repeat, args.students), indent=2))
+    elif args.command == "suite":
+        report = json.dumps(bench_suite(args.repeat, args.students, args.images), indent=2)
+        if args.output:
+            with open(args.output, "w") as f: f.write(report + "\n")
+        else: print(report)
+    elif args.command == "compare":
+        sys.exit(0 if compare(args.before, args.after, args.threshold) else 1)
+    elif args.command == "replicas":
+        print(json.dumps(bench_replicas(args.processes, args.seconds, args.backend), indent=2))
+    elif args.command == "groups":
+        print(json.dumps(bench_groups(args.repeat, args.students, args.group_size, args.history), indent=2))
+
+if __name__ == "__main__":
+    main()
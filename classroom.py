@@ -0,0 +1,351 @@
+"""Process-wide classroom state shared by every browser session.
+
+One `ClassroomStore` per classroom holds the roster, scores, the seat map,
+the current group battle and the shared timer in memory. Sessions read a snapshot of it and write through its
+methods, which persist to the storage backend and bump `version`; a session
+only copies the snapshot again (and re-renders) when `version` has moved.
+
+With a `replicas.Coordinator`, stores of the same classroom in several
+processes stay in step: writes run under the classroom's cross-process lock
+(catching up first if another replica wrote since), and a change announced
+by another replica bumps `version` at once and reloads on the next read.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from grouping import pair_counts
+from history import GROUP, POINT, RESET, UNDO
+from leaderboard import Leaderboard
+from picker import WeightedPicker
+
+BATTLE_HISTORY = 10   # past battles whose pairings new groups try to avoid
+REPLAYABLE = {"points", "group_points", "swap", "pick", "timer"}   # writes other replicas apply without reloading
+
+# Weight of each student under each picker mode. "fewer_picks" uses the
+# decayed count of recent picks, "low_score" favours students behind.
+PICK_WEIGHTS = {
+    "equal": lambda store, name: 1.0,
+    "fewer_picks": lambda store, name: 1.0 / (1.0 + store.recent_picks.get(name, 0.0)),
+    "low_score": lambda store, name: 1.0 / (1.0 + max(store.scores.get(name, 0), 0)),
+}
+
+
+class ClassroomStore:
+    def __init__(self, storage, classroom, default_students, history, coordinator=None):
+        self.storage = storage
+        self.coordinator = coordinator
+        self.classroom = classroom
+        self.history = history   # ScoreHistory: every point, for trends and undoing resets
+        self.default_students = list(default_students)
+        self.version = 0
+        self.generation = self._remote_generation = 0   # replicas: changes loaded / announced
+        # Writes persist while holding the lock, so the order on disk always
+        # matches the order in memory (a roster snapshot can't race a delta).
+        self._lock = threading.RLock()
+        self._log_offset = 0   # how far into the replicas' change log we have applied
+        if coordinator is None: self._load()
+        else:
+            with coordinator.shared(classroom) as gen:
+                self._load()
+                self._log_offset = coordinator.log_end(classroom)
+            self.generation = self._remote_generation = gen
+            coordinator.watch(classroom, self._announced)
+
+    def _load(self):
+        students, scores = self.storage.load_roster(self.classroom, self.default_students)
+        self.students = list(students)
+        self.scores = {name: scores.get(name, 0) for name in self.students}
+        self.leaderboard = Leaderboard(self.students, self.scores)
+        self.groups, self.group_scores = self.storage.load_groups(self.classroom)
+        self.battles = deque(self.storage.load_battles(self.classroom, BATTLE_HISTORY), maxlen=BATTLE_HISTORY)
+        self.seat_layout, seats = self.storage.load_seats(self.classroom)
+        self.seats = self._reseat(seats)
+        live = self.storage.load_live(self.classroom)
+        self.timer_end = live.get("timer_end")   # time.time() the shared timer runs out; None when stopped
+        self.last_pick = tuple(live.get("last_pick", (0, None)))
+        self.recent_picks, self._picks_since_decay, self._pickers = {}, 0, {}
+        for name in self.storage.load_picks(self.classroom, 4 * max(len(self.students), 1)):
+            self._note_pick(name)
+
+    def _reseat(self, seats):
+        """`seats` with departed students' seats emptied and newcomers in the first free ones."""
+        roster, seated, placed = set(self.students), [], set()
+        for name in seats:
+            keep = name in roster and name not in placed
+            seated.append(name if keep else "")
+            if keep: placed.add(name)
+        newcomers = iter([name for name in self.students if name not in placed])
+        return [name or next(newcomers, "") for name in seated] + list(newcomers)
+
+    def _bump(self):
+        self.version += 1
+
+    # --- Replicas ---
+    def _announced(self, gen):
+        # Listener thread: another replica changed the class. Sessions rerun
+        # on the version bump; catching up waits for the first one to read.
+        with self._lock:
+            if gen <= max(self.generation, self._remote_generation): return
+            self._remote_generation = gen
+            self._bump()
+
+    def _replay(self, op):
+        """Apply another replica's logged write in memory (storage already has it)."""
+        kind, *args = op
+        if kind == "points": self._apply_points(*args)
+        elif kind == "group_points":
+            for group_idx, delta in args[0]:
+                if 0 <= group_idx < len(self.groups): self.group_scores[group_idx] = self.group_scores.get(group_idx, 0) + delta
+        elif kind == "swap":
+            a, b = args
+            self.seats += [""] * (max(a, b) + 1 - len(self.seats))
+            self.seats[a], self.seats[b] = self.seats[b], self.seats[a]
+        elif kind == "pick":
+            self._note_pick(args[1])
+            self.last_pick = tuple(args)
+        elif kind == "timer": self.timer_end = args[0]
+
+    def _sync(self, gen):
+        """Bring memory up to generation `gen` (a coordinator lock held): replay the log, or reload."""
+        if gen == self.generation: return
+        ops, self._log_offset = self.coordinator.changes(self.classroom, self._log_offset, self.generation)
+        if ops is None or len(ops) != gen - self.generation or not all(op and op[0] in REPLAYABLE for op in ops):
+            self._load()
+        else:
+            for op in ops: self._replay(op)
+        self.history.refresh()
+        self.generation = gen
+        self._remote_generation = max(self._remote_generation, gen)
+
+    def _catch_up(self):
+        """Load whatever other replicas announced (lock held)."""
+        if self._remote_generation > self.generation:
+            with self.coordinator.shared(self.classroom) as gen: self._sync(gen)
+
+    @contextmanager
+    def _writing(self):
+        """One write: the store lock, plus the classroom's cross-process lock with replicas.
+
+        Yields a dict; a write other replicas can replay sets "op" (see _replay).
+        """
+        with self._lock:
+            if self.coordinator is None:
+                yield {}
+                return
+            try:
+                with self.coordinator.exclusive(self.classroom) as change:
+                    seen = self.generation
+                    self._sync(change["gen"])
+                    # Another replica's change loaded here, maybe before its datagram: sessions
+                    # must rerun for it even if this write then changes nothing
+                    if self.generation != seen: self._bump()
+                    yield change
+            except BaseException:
+                self.generation = -1   # unsure what reached storage: reload before the next use
+                raise
+            self.generation, self._log_offset = change["gen"], change["offset"]
+
+    def _save_live(self):
+        self.storage.save_live(self.classroom, {"timer_end": self.timer_end, "last_pick": list(self.last_pick)})
+
+    def snapshot(self):
+        """(version, students, scores, groups, group_scores, seat_layout, seats, last_pick, timer_end) as private copies."""
+        with self._lock:
+            self._catch_up()
+            return (self.version, list(self.students), dict(self.scores),
+                    [list(g) for g in self.groups], dict(self.group_scores),
+                    self.seat_layout, list(self.seats), self.last_pick, self.timer_end)
+
+    # --- Roster & individual scores ---
+    def set_roster(self, students, new_scores=None):
+        """Replace the roster in one write. Students who stay keep their scores;
+        newcomers start from `new_scores` (or 0). Groups are cleared only if a
+        member left."""
+        with self._writing():
+            new_scores = new_scores or {}
+            scores = {name: self.scores[name] if name in self.scores else new_scores.get(name, 0) for name in students}
+            self.storage.save_roster(self.classroom, students, scores)
+            roster = set(students)
+            if not all(name in roster for group in self.groups for name in group):
+                self.storage.start_battle(self.classroom, [])
+                self.groups, self.group_scores = [], {}
+            self.students, self.scores = list(students), scores
+            self.leaderboard = Leaderboard(self.students, scores)
+            self.seats = self._reseat(self.seats)
+            self.storage.save_seats(self.classroom, self.seat_layout, self.seats)
+            self._pickers = {}
+            self._bump()
+
+    def _apply_points(self, name, delta):
+        if name not in self.scores: return
+        self.scores[name] += delta
+        self.leaderboard.update(name, self.scores[name])
+        if "low_score" in self._pickers:
+            self._pickers["low_score"].set(name, PICK_WEIGHTS["low_score"](self, name))
+
+    def add_points(self, name, delta, session=None):
+        with self._writing() as change:
+            if name not in self.scores: return
+            self.storage.record_score(self.classroom, name, delta, session)
+            self.history.record([(name, delta)], POINT)
+            self._apply_points(name, delta)
+            change["op"] = ["points", name, delta]
+            self._bump()
+
+    def _set_scores(self, scores):
+        self.storage.save_roster(self.classroom, self.students, scores)
+        self.scores = scores
+        self.leaderboard = Leaderboard(self.students, scores)
+        self._pickers.pop("low_score", None)
+        self._bump()
+
+    def reset_scores(self):
+        """Zero every score. The wiped points stay in the history and can be restored."""
+        with self._writing():
+            self.history.record([(name, -score) for name, score in self.scores.items() if score], RESET)
+            self._set_scores({name: 0 for name in self.students})
+
+    def undo_reset(self):
+        """Give back the points wiped by the last reset, on top of anything earned since."""
+        with self._writing():
+            wiped = self.history.last_reset()
+            if wiped is None: return
+            self.history.record(list(wiped.items()), UNDO)
+            self._set_scores({name: score + wiped.get(name, 0) for name, score in self.scores.items()})
+
+    def reset(self):
+        """Factory reset: back to the default roster with no scores or groups."""
+        with self._writing():
+            self.storage.reset(self.classroom)
+            self.history.clear()
+            self._load()
+            self._bump()
+
+    def ranking(self, start=0, stop=None):
+        """[(rank, name, score), ...] for leaderboard positions start..stop-1."""
+        with self._lock:
+            self._catch_up()
+            return self.leaderboard.page(start, len(self.leaderboard) if stop is None else stop)
+
+    def rank(self, name):
+        """(rank, class size), or None for a name not on the roster."""
+        with self._lock:
+            self._catch_up()
+            return (self.leaderboard.rank(name), len(self.leaderboard)) if name in self.leaderboard else None
+
+    # --- Seat map ---
+    # Seats are indexes into the room layout; "" is an empty seat. Every
+    # change bumps `version`, which is what browsers patch against.
+    def swap_seats(self, a, b, names):
+        """Swap seats `a` and `b` if they still hold `names`; False if someone moved them first."""
+        with self._writing() as change:
+            if min(a, b) < 0: return False
+            seats = self.seats + [""] * (max(a, b) + 1 - len(self.seats))
+            if [seats[a], seats[b]] != list(names): return False
+            seats[a], seats[b] = seats[b], seats[a]
+            self.storage.save_seats(self.classroom, self.seat_layout, seats)
+            self.seats = seats
+            change["op"] = ["swap", a, b]
+            self._bump()
+            return True
+
+    def set_seat_layout(self, layout, capacity):
+        """Switch rooms, moving anyone seated past `capacity` into the first free seats."""
+        with self._writing():
+            kept, overflow = self.seats[:capacity], [name for name in self.seats[capacity:] if name]
+            free = iter(i for i, name in enumerate(kept) if not name)
+            for name in overflow:
+                i = next(free, None)
+                if i is None: kept.append(name)
+                else: kept[i] = name
+            self.storage.save_seats(self.classroom, layout, kept)
+            self.seat_layout, self.seats = layout, kept
+            self._bump()
+
+    def reset_seats(self):
+        """Seat everyone in roster order again."""
+        with self._writing():
+            self.storage.save_seats(self.classroom, self.seat_layout, list(self.students))
+            self.seats = list(self.students)
+            self._bump()
+
+    # --- Picker ---
+    def _picker(self, mode):
+        if mode not in self._pickers:
+            weight = PICK_WEIGHTS[mode]
+            self._pickers[mode] = WeightedPicker((name, weight(self, name)) for name in self.students)
+        return self._pickers[mode]
+
+    def _note_pick(self, name):
+        # Recent picks halve once per roster's worth of picks: one O(n)
+        # rebuild every n draws keeps "fewer_picks" amortized O(1).
+        self.recent_picks[name] = self.recent_picks.get(name, 0.0) + 1.0
+        self._picks_since_decay += 1
+        if self._picks_since_decay >= max(len(self.students), 1):
+            self.recent_picks = {n: c / 2 for n, c in self.recent_picks.items() if c >= 0.125}
+            self._picks_since_decay = 0
+            self._pickers.pop("fewer_picks", None)
+        elif "fewer_picks" in self._pickers:
+            self._pickers["fewer_picks"].set(name, PICK_WEIGHTS["fewer_picks"](self, name))
+
+    def pick(self, mode="equal", session=None):
+        """Draw a student (weighted by `mode`), record it, and return the name."""
+        with self._writing() as change:
+            name = self._picker(mode).draw()
+            if name is None: return None
+            self.storage.record_pick(self.classroom, name, session)
+            self._note_pick(name)
+            self.last_pick = (self.last_pick[0] + 1, name)
+            self._save_live()
+            change["op"] = ["pick", *self.last_pick]
+            self._bump()
+            return name
+
+    # --- Timer ---
+    def start_timer(self, seconds):
+        with self._writing() as change:
+            self.timer_end = time.time() + seconds
+            self._save_live()
+            change["op"] = ["timer", self.timer_end]
+            self._bump()
+
+    def stop_timer(self):
+        with self._writing() as change:
+            self.timer_end = None
+            self._save_live()
+            change["op"] = ["timer", None]
+            self._bump()
+
+    # --- Group battle ---
+    def start_battle(self, groups):
+        with self._writing():
+            self.storage.start_battle(self.classroom, groups)
+            self.groups = [list(g) for g in groups]
+            if groups: self.battles.append(self.groups)
+            self.group_scores = {i: 0 for i in range(len(groups))}
+            self._bump()
+
+    def past_pairings(self):
+        """How often each pair shared a group in the last BATTLE_HISTORY battles."""
+        with self._lock:
+            self._catch_up()
+            return pair_counts(self.battles)
+
+    def add_group_points(self, points, session=None):
+        """Several [group index, delta] increments (a batch of clicks) in one write."""
+        with self._writing() as change:
+            points = [(i, delta) for i, delta in points if 0 <= i < len(self.groups) and delta]
+            if not points: return
+            self.storage.add_group_points(self.classroom, points, session)
+            for group_idx, delta in points: self.group_scores[group_idx] = self.group_scores.get(group_idx, 0) + delta
+            self.history.record([(f"Group {i + 1}", delta) for i, delta in points], GROUP)
+            change["op"] = ["group_points", points]
+            self._bump()
+
+    def reset_group_scores(self):
+        with self._writing():
+            self.storage.reset_group_scores(self.classroom)
+            self.group_scores = {i: 0 for i in range(len(self.groups))}
+            self._bump()
@@ -0,0 +1,143 @@
+"""Resized copies of the quiz photos, rendered ahead of time.
+
+`DerivativeCache` keeps WebP (or JPEG, without WebP support) copies of the
+source photos at the widths the app displays, in a size-bounded folder:
+
+- copies are content-addressed, so renames and duplicate uploads are free;
+- the least recently served copies are evicted past `max_bytes`, and the
+  in-memory source digests are capped at `max_digests` entries;
+- a photo whose copy would not be smaller (or an animated GIF) is served
+  as-is.
+
+`ImagePrefetcher` renders upcoming photos on a small thread pool so the
+next question is usually a cache hit.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, features
+
+
+class DerivativeCache:
+    """On-disk, content-addressed cache of resized WebP/JPEG copies.
+
+    Files are named `<sha1 of source>_<width>.<ext>`, so renaming a photo keeps
+    its derivatives and two identical uploads share them. The folder is kept
+    under `max_bytes` by evicting the least recently served files.
+    """
+    def __init__(self, cache_dir, max_bytes, max_digests=4096):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_digests = max_digests
+        self.ext, self.fmt = (".webp", "WEBP") if features.check("webp") else (".jpg", "JPEG")
+        self._lock = threading.Lock()
+        self._digests = OrderedDict()    # (path, mtime, size) -> sha1 of the source bytes, oldest first
+        self._lru = OrderedDict()        # derivative path -> size, oldest first
+        self._passthrough = set()        # derivative paths whose source is served as-is
+        os.makedirs(cache_dir, exist_ok=True)
+        with os.scandir(cache_dir) as entries:
+            existing = sorted((e.stat().st_mtime, e.path, e.stat().st_size) for e in entries if e.is_file())
+        for _, path, size in existing: self._lru[path] = size
+        self._total = sum(self._lru.values())
+
+    def _digest(self, path):
+        info = os.stat(path)
+        key = (path, info.st_mtime_ns, info.st_size)
+        with self._lock: digest = self._known(key)
+        if digest is None:
+            h = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""): h.update(chunk)
+            digest = h.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+                # Edited or deleted photos leave stale keys behind; keep only the most recent
+                while len(self._digests) > self.max_digests: self._digests.popitem(last=False)
+        return digest
+
+    def _known(self, key):
+        digest = self._digests.get(key)
+        if digest is not None: self._digests.move_to_end(key)
+        return digest
+
+    def _render(self, src, dest, width):
+        with Image.open(src) as img:
+            if getattr(img, "is_animated", False): return False   # keep GIF animations as-is
+            img = ImageOps.exif_transpose(img)   # phone photos carry their rotation in EXIF
+            img.thumbnail((width, width * 4))
+            if self.fmt == "JPEG" and img.mode != "RGB": img = img.convert("RGB")
+            tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+            img.save(tmp, self.fmt, quality=80)
+        os.replace(tmp, dest)
+        return True
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._lru) > 1:
+            path, size = self._lru.popitem(last=False)
+            self._total -= size
+            try: os.remove(path)
+            except OSError: pass
+
+    def _path(self, digest, width):
+        return os.path.join(self.cache_dir, f"{digest}_{width}{self.ext}")
+
+    def cached(self, src, width):
+        """Like get(), but never hashes or renders: returns None unless already done."""
+        try: info = os.stat(src)
+        except OSError: return None
+        with self._lock: digest = self._known((src, info.st_mtime_ns, info.st_size))
+        if digest is None: return None
+        dest = self._path(digest, width)
+        if dest in self._passthrough: return src
+        return dest if dest in self._lru else None
+
+    def get(self, src, width):
+        """Return the path of `src` resized to `width`, or `src` itself."""
+        dest = self._path(self._digest(src), width)
+        with self._lock:
+            if dest in self._passthrough: return src
+            if dest in self._lru:
+                self._lru.move_to_end(dest)
+                os.utime(dest)   # keeps the LRU order across restarts
+                return dest
+        # Render outside the lock so a slow photo doesn't stall cache hits
+        if not self._render(src, dest, width):
+            self._passthrough.add(dest)
+            return src
+        size = os.path.getsize(dest)
+        if size >= os.path.getsize(src):
+            os.remove(dest)
+            self._passthrough.add(dest)
+            return src
+        with self._lock:
+            if dest not in self._lru:
+                self._lru[dest] = size
+                self._total += size
+                self._evict()
+        return dest
+
+
+class ImagePrefetcher:
+    """Renders upcoming quiz images on a small thread pool so 'Next' is a cache hit."""
+    def __init__(self, cache, width, workers=2):
+        self.cache = cache
+        self.width = width
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-prefetch")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, paths, width=None):
+        width = width or self.width
+        for path in paths:
+            with self._lock:
+                if (path, width) in self._pending: continue
+                self._pending.add((path, width))
+            self._pool.submit(self._run, path, width)
+
+    def _run(self, path, width):
+        try: self.cache.get(path, width)
+        except Exception: pass
+        finally:
+            with self._lock: self._pending.discard((path, width))
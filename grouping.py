@@ -0,0 +1,106 @@
+"""Balanced group formation for the Group Battle.
+
+`form_groups` splits a roster into groups whose sizes differ by at most one,
+so that each group's total score is close to its fair share and students who
+shared a group in recent battles are kept apart where possible:
+
+1. greedy seeding: students, highest score first, each join whichever of the
+   few groups furthest below their target total holds the fewest of their
+   past partners;
+2. bounded local search: random cross-group swaps, kept when they lower the
+   cost, until `max_swaps` tries or `budget_s` seconds are used up.
+"""
+import heapq
+import math
+import random
+import statistics
+import time
+from collections import Counter
+
+SEED_CANDIDATES = 3   # groups considered per student while seeding
+
+
+def pair_key(a, b):
+    return (a, b) if a < b else (b, a)
+
+def pair_counts(battles):
+    """How often each pair of students shared a group across `battles`."""
+    counts = Counter()
+    for groups in battles:
+        for group in groups:
+            members = sorted(group)
+            for i, a in enumerate(members):
+                for b in members[i + 1:]: counts[a, b] += 1
+    return counts
+
+def group_sizes(n, group_size):
+    k = math.ceil(n / group_size)
+    return [n // k + (1 if g < n % k else 0) for g in range(k)]
+
+def form_groups(students, scores, group_size, pairs=None, repeat_penalty=1.0,
+                max_swaps=None, budget_s=0.02, rng=None):
+    """Groups (lists of names) balanced on total score, avoiding repeat pairs.
+
+    `pairs` maps pair_key(a, b) to how often a and b were grouped before;
+    each such repeat costs `repeat_penalty`, against squared deviation from
+    the target totals measured in score standard deviations.
+    """
+    rng = rng or random
+    n = len(students)
+    if not n: return []
+    pairs = pairs or {}
+    score = {name: scores.get(name, 0) for name in students}
+    sizes = group_sizes(n, group_size)
+    k = len(sizes)
+    total = sum(score.values())
+    targets = [total * size / n for size in sizes]
+    scale2 = max(statistics.pstdev(score.values()), 1.0) ** 2
+
+    def repeats(name, members, skip=None):
+        return sum(pairs.get(pair_key(name, m), 0) for m in members if m != name and m != skip) if pairs else 0
+
+    # 1. Greedy seeding; ties in score stay in random order
+    order = list(students)
+    rng.shuffle(order)
+    order.sort(key=score.get, reverse=True)
+    groups, totals = [[] for _ in range(k)], [0.0] * k
+    heap = [(-targets[g], g) for g in range(k)]   # (total - target, group)
+    heapq.heapify(heap)
+    for name in order:
+        candidates = [heapq.heappop(heap) for _ in range(min(SEED_CANDIDATES, len(heap)))]
+        best = min(candidates, key=lambda c: (repeats(name, groups[c[1]]), c[0]))
+        for c in candidates:
+            if c is not best: heapq.heappush(heap, c)
+        g = best[1]
+        groups[g].append(name)
+        totals[g] += score[name]
+        if len(groups[g]) < sizes[g]: heapq.heappush(heap, (totals[g] - targets[g], g))
+
+    # 2. Bounded local search over cross-group swaps
+    if k > 1:
+        where = {name: g for g, members in enumerate(groups) for name in members}
+        deadline = time.perf_counter() + budget_s
+        for t in range(50 * n if max_swaps is None else max_swaps):
+            if t % 256 == 0 and time.perf_counter() > deadline: break
+            a, b = order[rng.randrange(n)], order[rng.randrange(n)]
+            ga, gb = where[a], where[b]
+            if ga == gb: continue
+            d = score[b] - score[a]
+            ea, eb = totals[ga] - targets[ga], totals[gb] - targets[gb]
+            delta = ((ea + d) ** 2 + (eb - d) ** 2 - ea ** 2 - eb ** 2) / scale2
+            if pairs:
+                delta += repeat_penalty * (repeats(a, groups[gb], b) + repeats(b, groups[ga], a)
+                                           - repeats(a, groups[ga]) - repeats(b, groups[gb]))
+            if delta < -1e-9:
+                groups[ga][groups[ga].index(a)], groups[gb][groups[gb].index(b)] = b, a
+                totals[ga] += d
+                totals[gb] -= d
+                where[a], where[b] = gb, ga
+    return groups
+
+def group_quality(groups, scores, pairs=None):
+    """Spread of per-member average score across groups, and repeat pairings."""
+    pairs = pairs or {}
+    means = [sum(scores.get(m, 0) for m in g) / len(g) for g in groups if g]
+    repeat = sum(pairs.get(pair_key(a, b), 0) for g in groups for i, a in enumerate(g) for b in g[i + 1:])
+    return {"mean_spread": max(means) - min(means) if means else 0, "repeat_pairs": repeat}
@@ -0,0 +1,163 @@
+"""Per-event score history in columnar files, with incremental rollups.
+
+Every individual point, group point, scoreboard reset and undo is one row in
+four parallel column files under `<root>/<classroom>/`:
+
+    ts.f64     event time (seconds since the epoch)
+    who.i32    index into names.txt (a student, or "Group <n>" for group points)
+    delta.i32  points
+    kind.i8    POINT, GROUP, RESET or UNDO
+
+Rows are appended with array.tofile, so an event costs 17 bytes and a whole
+term loads with one read per column. Rollups (per student and per class, by
+day and by ISO week, plus term totals) are built once on load and updated as
+each event is appended; trend charts and totals read only the rollups.
+Several processes may share the folder: appends hold `.lock`, and
+`refresh()` (or the next `record`) rolls in rows the others appended.
+"""
+import os
+import time
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import quote
+
+try: import fcntl
+except ImportError: fcntl = None
+
+POINT, GROUP, RESET, UNDO = 0, 1, 2, 3
+COLUMNS = (("ts", "d", "f64"), ("who", "i", "i32"), ("delta", "i", "i32"), ("kind", "b", "i8"))
+
+
+class ScoreHistory:
+    def __init__(self, root, classroom):
+        self.path = os.path.join(root, quote(classroom, safe=""))
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _file(self, column):
+        return os.path.join(self.path, next(f"{name}.{ext}" for name, _, ext in COLUMNS if name == column))
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try: yield
+            finally:
+                if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        self.names, self._ids = [], {}
+        self.columns = {name: array(code) for name, code, _ in COLUMNS}
+        self.daily = defaultdict(Counter)        # day ordinal -> {student: points}
+        self.weekly = defaultdict(Counter)       # (ISO year, week) -> {student: points}
+        self.class_daily = Counter()             # day ordinal -> points, students + groups
+        self.class_weekly = Counter()            # (ISO year, week) -> points, students + groups
+        self.term = Counter()                    # student -> points earned, resets aside
+        self._resets = []                        # [(ts, {student: points wiped})] not undone yet
+        self._batch = None                       # (kind, ts) of the reset/undo being replayed
+        with self._lock():
+            names_file = os.path.join(self.path, "names.txt")
+            if os.path.exists(names_file):
+                with open(names_file, encoding="utf-8") as f: self.names = f.read().split("\n")[:-1]
+            self._ids = {name: i for i, name in enumerate(self.names)}
+            for name, _, _ in COLUMNS:
+                path = self._file(name)
+                if os.path.exists(path):
+                    column = self.columns[name]
+                    with open(path, "rb") as f: column.frombytes(f.read())
+        # A crash mid-append can leave columns of different lengths; trust the shortest
+        rows = min(len(c) for c in self.columns.values())
+        for column in self.columns.values(): del column[rows:]
+        c = self.columns
+        for ts, who, delta, kind in zip(c["ts"], c["who"], c["delta"], c["kind"]):
+            self._roll(ts, self.names[who], delta, kind)
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def _catch_up(self):
+        """Roll in rows another process appended since we last read (lock held). False if the files shrank."""
+        rows = len(self)
+        try: size = os.path.getsize(self._file("ts"))
+        except OSError: size = 0
+        if size <= rows * self.columns["ts"].itemsize: return size == rows * self.columns["ts"].itemsize
+        with open(os.path.join(self.path, "names.txt"), encoding="utf-8") as f: names = f.read().split("\n")[:-1]
+        for name in names[len(self.names):]:
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+        tail = {}
+        for name, code, _ in COLUMNS:
+            column = tail[name] = array(code)
+            with open(self._file(name), "rb") as f:
+                f.seek(rows * column.itemsize)
+                data = f.read()
+            column.frombytes(data[:len(data) - len(data) % column.itemsize])
+        new_rows = min(len(c) for c in tail.values())
+        for name, column in tail.items(): self.columns[name].extend(column[:new_rows])
+        c = tail
+        for i in range(new_rows): self._roll(c["ts"][i], self.names[c["who"][i]], c["delta"][i], c["kind"][i])
+        return True
+
+    def refresh(self):
+        """Catch up with events recorded by other processes (reloading if the history was cleared)."""
+        with self._lock(): current = self._catch_up()
+        if not current: self._load()
+
+    def _roll(self, ts, name, delta, kind):
+        if kind in (RESET, UNDO):
+            # Rows of one reset (or undo) share a timestamp
+            if self._batch != (kind, ts):
+                self._batch = (kind, ts)
+                if kind == RESET: self._resets.append((ts, {}))
+                elif self._resets: self._resets.pop()
+            if kind == RESET: self._resets[-1][1][name] = -delta
+            return
+        day = date.fromtimestamp(ts)
+        ordinal, week = day.toordinal(), tuple(day.isocalendar())[:2]
+        self.class_daily[ordinal] += delta
+        self.class_weekly[week] += delta
+        if kind == POINT:
+            self.daily[ordinal][name] += delta
+            self.weekly[week][name] += delta
+            self.term[name] += delta
+
+    def record(self, events, kind):
+        """Append `events` ([(name, delta), ...]) of one kind, sharing one timestamp."""
+        if not events: return
+        ts = time.time()
+        with self._lock():
+            self._catch_up()   # another replica may have appended (and added names) since
+            new_names = [name for name in dict.fromkeys(name for name, _ in events) if name not in self._ids]
+            if new_names:
+                with open(os.path.join(self.path, "names.txt"), "a", encoding="utf-8") as f:
+                    f.write("".join(name + "\n" for name in new_names))
+                for name in new_names:
+                    self._ids[name] = len(self.names)
+                    self.names.append(name)
+            rows = {"ts": array("d", [ts] * len(events)), "who": array("i", [self._ids[n] for n, _ in events]),
+                    "delta": array("i", [d for _, d in events]), "kind": array("b", [kind] * len(events))}
+            for name, column in rows.items():
+                with open(self._file(name), "ab") as f: column.tofile(f)
+                self.columns[name].extend(column)
+        for name, delta in events: self._roll(ts, name, delta, kind)
+
+    def last_reset(self):
+        """{student: points} wiped by the latest reset that hasn't been undone, or None."""
+        return dict(self._resets[-1][1]) if self._resets else None
+
+    def trend(self, period="day", name=None):
+        """[(label, points), ...] in time order, for one student or (name=None) the class."""
+        if period == "day":
+            source = self.class_daily if name is None else {d: c[name] for d, c in self.daily.items() if name in c}
+            return [(date.fromordinal(d).isoformat(), source[d]) for d in sorted(source)]
+        source = self.class_weekly if name is None else {w: c[name] for w, c in self.weekly.items() if name in c}
+        return [(f"{y}-W{w:02d}", source[(y, w)]) for y, w in sorted(source)]
+
+    def clear(self):
+        with self._lock():
+            for name in ["names.txt"] + [f"{n}.{ext}" for n, _, ext in COLUMNS]:
+                path = os.path.join(self.path, name)
+                if os.path.exists(path): os.remove(path)
+        self._load()
@@ -0,0 +1,114 @@
+"""Streaming roster import from CSV or JSON Lines files.
+
+Rows are parsed one at a time and handled in chunks of `CHUNK_ROWS`: each
+chunk is validated and de-duplicated against every name seen so far before
+the next one is read, so memory grows with the number of distinct students,
+never with the size of the file. Nothing is written here; the caller commits
+the result in one batch.
+
+Files are read as UTF-8 and, failing that, as cp1252 (what Excel and most
+registrar exports write on Windows).
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+CHUNK_ROWS = 1000
+MAX_NAME_LENGTH = 100
+MAX_ERRORS = 20   # error messages kept for display; all are counted
+NAME_FIELDS = ("name", "student", "student_name", "full_name", "full name")
+SCORE_FIELDS = ("score", "points")
+SECTION_FIELDS = ("section", "class", "course")
+ENCODINGS = ("utf-8-sig", "cp1252")
+
+
+class RosterImport:
+    def __init__(self):
+        self.students = []     # distinct names, in file order
+        self.scores = {}       # name -> score, for rows that carried one
+        self.rows = 0
+        self.duplicates = 0
+        self.skipped = 0       # rows of other sections
+        self.errors = []
+        self.error_count = 0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS: self.errors.append(f"line {line}: {message}" if line else message)
+
+def _field(row, candidates):
+    for key, value in row.items():
+        if key is not None and key.strip().lower() in candidates: return value
+    return None
+
+def iter_rows(stream, fmt, encoding=ENCODINGS[0]):
+    """(line number, dict) for each record of a binary `stream`; None for unparseable lines.
+
+    CSV the csv module rejects (an oversized field, say) ends the file with one None.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="" if fmt == "csv" else None)
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            try:
+                for row in reader: yield reader.line_num, row
+            except csv.Error: yield reader.line_num + 1, None
+        else:
+            for line_no, line in enumerate(text, 1):
+                if not line.strip(): continue
+                try: record = json.loads(line)
+                except ValueError: record = None
+                yield line_no, record if isinstance(record, dict) else None
+    finally: text.detach()   # the caller's stream stays open
+
+def import_roster(stream, fmt, section=None, progress=None, total_bytes=None):
+    """Read a roster from `stream` ('csv' or 'jsonl'), optionally one section only.
+
+    `progress(fraction)` is called after every chunk when `total_bytes` is known.
+    """
+    start = stream.tell()
+    for encoding in ENCODINGS:
+        stream.seek(start)
+        try: return _import(iter_rows(stream, fmt, encoding), stream, fmt, section, progress, total_bytes)
+        except UnicodeDecodeError as e: failure = e
+    result = RosterImport()
+    result.error(None, f"the file is neither UTF-8 nor cp1252 text ({failure.reason} at byte {failure.start})")
+    return result
+
+def _import(rows, stream, fmt, section, progress, total_bytes):
+    result, seen = RosterImport(), set()
+    section = section.strip().lower() if section else None
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk: break
+        for line, row in chunk:
+            result.rows += 1
+            if row is None:
+                result.error(line, "not valid CSV" if fmt == "csv" else "not a JSON object")
+                continue
+            name = _field(row, NAME_FIELDS)
+            name = str(name).strip() if name is not None else ""
+            if not name:
+                result.error(line, "no student name")
+                continue
+            if len(name) > MAX_NAME_LENGTH:
+                result.error(line, f"name longer than {MAX_NAME_LENGTH} characters")
+                continue
+            if section and str(_field(row, SECTION_FIELDS) or "").strip().lower() != section:
+                result.skipped += 1
+                continue
+            score = _field(row, SCORE_FIELDS)
+            if score not in (None, ""):
+                try: score = int(float(score))
+                except (TypeError, ValueError):
+                    result.error(line, f"score {score!r} is not a number")
+                    continue
+            if name in seen:
+                result.duplicates += 1
+                continue
+            seen.add(name)
+            result.students.append(name)
+            if score not in (None, ""): result.scores[name] = score
+        if progress and total_bytes: progress(min(stream.tell() / total_bytes, 1.0))
+    return result
@@ -0,0 +1,43 @@
+"""Incrementally maintained score ranking.
+
+`Leaderboard` keeps students in a SortedList keyed on (-score, roster
+position), i.e. highest score first with ties in roster order, so a score
+change is an O(log n) remove + insert instead of a full re-sort, and rank,
+top-K and page lookups are O(log n + rows returned).
+"""
+from sortedcontainers import SortedList
+
+
+class Leaderboard:
+    def __init__(self, students, scores):
+        self._position = {name: i for i, name in enumerate(students)}
+        self._score = {name: scores.get(name, 0) for name in students}
+        self._order = SortedList((-score, self._position[name], name) for name, score in self._score.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, name):
+        return name in self._score
+
+    def update(self, name, score):
+        old = self._score[name]
+        if old == score: return
+        self._order.remove((-old, self._position[name], name))
+        self._score[name] = score
+        self._order.add((-score, self._position[name], name))
+
+    def rank(self, name):
+        """1-based rank; students on the same score share it."""
+        return self._order.bisect_left((-self._score[name],)) + 1
+
+    def page(self, start, stop):
+        """[(rank, name, score), ...] for positions start..stop-1."""
+        rows = []
+        for neg_score, _, name in self._order.islice(start, stop):
+            rank = rows[-1][0] if rows and rows[-1][2] == -neg_score else self._order.bisect_left((neg_score,)) + 1
+            rows.append((rank, name, -neg_score))
+        return rows
+
+    def top(self, k):
+        return self.page(0, k)
@@ -0,0 +1,73 @@
+"""Weighted random picking with O(1) draws.
+
+`WeightedPicker` keeps a Walker alias table over an upper bound of each
+weight and accepts a drawn slot with probability weight / bound, so:
+
+- a draw is two random numbers plus, on average, fewer than two retries;
+- lowering a weight (the common case: someone was just picked, or scored)
+  is O(1) and leaves the table alone;
+- raising a weight above its bound, adding a name, or letting the accept
+  rate fall below one half marks the table stale, and the next draw
+  rebuilds it in O(n).
+"""
+import random
+
+
+class WeightedPicker:
+    def __init__(self, weights=(), rng=None):
+        self._rng = rng or random.Random()
+        self._names, self._index, self._weight = [], {}, []
+        self._total = self._bound_total = 0.0
+        self._stale = True
+        for name, weight in weights: self.set(name, weight)
+
+    def __len__(self):
+        return sum(1 for w in self._weight if w > 0)
+
+    def set(self, name, weight):
+        """Set `name`'s weight; 0 removes it from the draw."""
+        weight = max(float(weight), 0.0)
+        i = self._index.get(name)
+        if i is None:
+            if not weight: return
+            self._index[name] = len(self._names)
+            self._names.append(name)
+            self._weight.append(0.0)
+            self._stale = True
+            i = self._index[name]
+        elif not self._stale and weight > self._bound[i]:
+            self._stale = True
+        self._total += weight - self._weight[i]
+        self._weight[i] = weight
+
+    def _rebuild(self):
+        # Drop removed names, then Vose's alias method over the current weights
+        live = [(n, w) for n, w in zip(self._names, self._weight) if w > 0]
+        self._names = [n for n, _ in live]
+        self._weight = [w for _, w in live]
+        self._index = {n: i for i, n in enumerate(self._names)}
+        self._bound = list(self._weight)
+        self._total = self._bound_total = sum(self._weight)
+        n = len(self._names)
+        self._prob, self._alias = [1.0] * n, list(range(n))
+        scaled = [w * n / self._bound_total for w in self._weight] if n else []
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s], self._alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        self._stale = False
+
+    def draw(self):
+        """One name, with probability proportional to its weight; None if all are 0."""
+        if self._stale or self._total < self._bound_total / 2:
+            self._rebuild()
+        if not self._names or self._total <= 0: return None
+        rng, n = self._rng, len(self._names)
+        while True:
+            r = rng.random() * n
+            slot = int(r)
+            i = slot if r - slot < self._prob[slot] else self._alias[slot]
+            if rng.random() * self._bound[i] < self._weight[i]: return self._names[i]
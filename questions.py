@@ -0,0 +1,219 @@
+"""Data-driven question bank for the Look & Say games.
+
+Games and questions come from `DEFAULT_GAMES` plus an optional manifest,
+`quiz.json`, in the image folder:
+
+    {
+      "games": {
+        "lying": {"title": "🤥 The Lying Game", "question": "...", "options": ["...", "..."],
+                  "keywords": ["lie", "lying"]},
+        "eyes":  {"title": "👀 Eye Contact", "question": "...", "options": ["...", "..."]}
+      },
+      "images": [
+        {"file": "eyes_01.jpg", "game": "eyes", "answer": 1},
+        {"file": "lie_07.jpg", "game": "lying", "answer": "Making eye movements",
+         "question": "What gives this one away?"}
+      ]
+    }
+
+A game also picks up every image whose filename contains one of its
+`keywords` (answer-less: any choice counts). Manifest games override the
+built-in ones with the same id. `answer` is an option index or the option
+text; `question` and `options` may be set per image. Games and images of the
+wrong shape are skipped and listed in `errors`, like a manifest that isn't
+valid JSON.
+
+Everything is compiled into per-game lists (quiz order) and file -> Question
+dicts, and recompiled only when the folder's or the manifest's mtime
+changes, so the next question and an answer check are O(1).
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+VALID_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+MANIFEST_NAME = "quiz.json"
+
+DEFAULT_GAMES = {
+    "lying": {
+        "title": "🤥 The Lying Game",
+        "keywords": ["lie", "lying"],
+        "question": "🤔 What is the sign of lying?",
+        "options": [
+            "Making stiff body movements",
+            "Making eye movements",
+            "Touching or scratching themselves"
+        ],
+    },
+    "love": {
+        "title": "😍 The Love Game",
+        "keywords": ["love"],
+        "question": "🥰 What is the sign of attraction?",
+        "options": [
+            "Their eyes do the talking.",
+            "They copy the person's actions.",
+            "They point their shoulders toward the person or try to get closer."
+        ],
+    },
+}
+
+Question = namedtuple("Question", "file question options answer")   # answer: option index or None
+
+
+def _strings(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+def _game_problem(spec):
+    """Why a manifest game can't be used, or None."""
+    if not isinstance(spec, dict): return "must be an object"
+    for key in ("title", "question"):
+        if key in spec and not isinstance(spec[key], str): return f'"{key}" must be a string'
+    for key in ("options", "keywords"):
+        if key in spec and not _strings(spec[key]): return f'"{key}" must be a list of strings'
+    if not spec.get("options"): return 'needs a non-empty "options" list'
+    return _answer_problem(spec.get("answer"))
+
+def _answer_problem(answer):
+    """Why an "answer" value has the wrong type, or None."""
+    if answer is not None and (isinstance(answer, bool) or not isinstance(answer, (int, str))):
+        return '"answer" must be an option index or option text'
+    return None
+
+def _answer_index(answer, options):
+    """Option index for an answer given as an index or as option text; None if none is given, -1 if not an option."""
+    if answer is None: return None
+    if isinstance(answer, str): return options.index(answer) if answer in options else -1
+    return answer if 0 <= answer < len(options) else -1
+
+def _image_problem(entry):
+    """Why a manifest image entry can't be used, or None."""
+    if not isinstance(entry, dict): return "must be an object"
+    if not isinstance(entry.get("file"), str) or not isinstance(entry.get("game"), str):
+        return '"file" and "game" must be strings'
+    if "question" in entry and not isinstance(entry["question"], str): return '"question" must be a string'
+    if "options" in entry and not _strings(entry["options"]): return '"options" must be a list of strings'
+    return _answer_problem(entry.get("answer"))
+
+
+class QuestionBank:
+    def __init__(self, folder_path, poll_interval=2.0):
+        self.folder_path = folder_path
+        self.manifest_path = os.path.join(folder_path, MANIFEST_NAME)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._checked_at = 0.0
+        self._games = {}
+        self.errors = []   # manifest problems from the last compile
+
+    def _mtime(self, path):
+        try: return os.stat(path).st_mtime_ns
+        except OSError: return None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._stamp is not None and now - self._checked_at < self.poll_interval: return
+        self._checked_at = now
+        stamp = (self._mtime(self.folder_path), self._mtime(self.manifest_path))
+        if stamp == self._stamp: return
+        self._games, self.errors = self._compile()
+        self._stamp = stamp
+
+    def _compile(self):
+        errors, manifest = [], {}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f: manifest = json.load(f)
+                if not isinstance(manifest, dict): raise ValueError("top level must be an object")
+            except (OSError, ValueError) as e:
+                errors.append(f"{MANIFEST_NAME}: {e}")
+                manifest = {}
+        specs = dict(DEFAULT_GAMES)
+        manifest_games = manifest.get("games") or {}
+        if not isinstance(manifest_games, dict):
+            errors.append(f'{MANIFEST_NAME}: "games" must be an object of game id -> game')
+            manifest_games = {}
+        for gid, spec in manifest_games.items():
+            problem = _game_problem(spec)
+            if problem: errors.append(f"{MANIFEST_NAME}: skipped game {gid!r} ({problem})")
+            else: specs[gid] = spec
+        # A game-level answer applies to its keyword-matched images
+        answers = {}
+        for gid, spec in specs.items():
+            answers[gid] = _answer_index(spec.get("answer"), spec["options"])
+            if answers[gid] == -1:
+                errors.append(f"{MANIFEST_NAME}: game {gid!r} has an answer that is not one of its options")
+                answers[gid] = None
+        images = manifest.get("images") or []
+        if not isinstance(images, list):
+            errors.append(f'{MANIFEST_NAME}: "images" must be a list')
+            images = []
+        try:
+            with os.scandir(self.folder_path) as entries:
+                files = sorted(e.name for e in entries if os.path.splitext(e.name)[1].lower() in VALID_EXTENSIONS)
+        except OSError: files = []
+        present = set(files)
+
+        games = {gid: {"title": spec.get("title", gid), "by_file": {}} for gid, spec in specs.items()}
+        for entry in images:
+            problem = _image_problem(entry)
+            if problem:
+                errors.append(f"{MANIFEST_NAME}: skipped image {entry.get('file') if isinstance(entry, dict) else entry!r} ({problem})")
+                continue
+            gid, file = entry.get("game"), entry.get("file")
+            if gid not in specs or file not in present:
+                errors.append(f"{MANIFEST_NAME}: skipped {file!r} (unknown game or missing file)")
+                continue
+            spec = specs[gid]
+            options = list(entry.get("options") or spec.get("options") or [])
+            answer = _answer_index(entry.get("answer"), options)
+            if answer == -1:
+                errors.append(f"{MANIFEST_NAME}: {file!r} has an answer that is not one of its options")
+                answer = None
+            games[gid]["by_file"][file] = Question(file, entry.get("question") or spec.get("question", ""), options, answer)
+        # Keyword games: every filename is lower-cased and matched once per compile
+        keyword_games = [(gid, [k.lower() for k in spec["keywords"]]) for gid, spec in specs.items() if spec.get("keywords")]
+        for file in files:
+            low = file.lower()
+            for gid, keywords in keyword_games:
+                by_file = games[gid]["by_file"]
+                if file not in by_file and any(k in low for k in keywords):
+                    spec = specs[gid]
+                    by_file[file] = Question(file, spec.get("question", ""), list(spec["options"]), answers[gid])
+        for game in games.values(): game["order"] = sorted(game["by_file"])
+        return games, errors
+
+    def games(self):
+        """[(game id, title), ...] in manifest order."""
+        with self._lock:
+            self._refresh()
+            return [(gid, g["title"]) for gid, g in self._games.items()]
+
+    def next_after(self, game, idx):
+        """(Question at position `idx`, wrapping to 0, and the next index); (None, 0) if the game is empty."""
+        with self._lock:
+            self._refresh()
+            order = self._games.get(game, {}).get("order") or []
+            if not order: return None, 0
+            if idx >= len(order): idx = 0
+            return self._games[game]["by_file"][order[idx]], (idx + 1) % len(order)
+
+    def peek(self, game, idx, count):
+        """Filenames of the next `count` questions starting at position `idx`."""
+        with self._lock:
+            self._refresh()
+            order = self._games.get(game, {}).get("order") or []
+            if not order: return []
+            if idx >= len(order): idx = 0
+            return [order[(idx + i) % len(order)] for i in range(min(count, len(order)))]
+
+    def lookup(self, game, file):
+        with self._lock:
+            self._refresh()
+            return self._games.get(game, {}).get("by_file", {}).get(file)
+
+    def check(self, question, choice):
+        """True if option index `choice` answers `question` (any choice does when it has no answer)."""
+        return question.answer is None or question.answer == choice
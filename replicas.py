@@ -0,0 +1,225 @@
+"""Coordination between several app processes (replicas) on one host.
+
+Replicas share the storage backend (the SQLite database or the CSV files)
+and a coordination directory:
+
+    <root>/<classroom>.gen   8-byte generation counter, also the classroom's lock file
+    <root>/<classroom>.log   JSON line per generation: the write that made it
+    <root>/bus/<id>.sock     one Unix datagram socket per replica
+
+A ClassroomStore write holds the classroom's exclusive flock from start to
+finish: it catches up first if the generation moved since it last looked,
+writes to storage, logs what it did, bumps the generation and, after
+unlocking, sends `{"classroom", "gen"}` to every other replica's socket.
+Catching up replays the logged writes a store knows how to apply in memory
+(points, picks, swaps, the timer) and reloads from storage otherwise, so
+the common click costs O(1) per replica however many replicas there are.
+
+Receivers only note the new generation (and bump their store's version so
+sessions rerun); the store catches up lazily, once, when a session next
+reads it. A lost datagram is covered by each replica re-reading the
+counters of its classrooms every `poll_interval` seconds.
+
+Run e.g. three replicas behind a load balancer with
+
+    CLASSROOM_STORAGE=sqlite CLASSROOM_COORDINATION=/tmp/classroom-coord \
+        streamlit run app.py --server.port 8501   # ...8502, 8503
+"""
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import quote
+
+try: import fcntl
+except ImportError: fcntl = None   # Windows: no replicas
+
+GEN = struct.Struct("<q")
+LOG_BYTES = 1024 * 1024   # the change log starts over past this; readers behind it reload
+
+
+class Coordinator:
+    def __init__(self, root, poll_interval=1.0, peer_refresh=1.0, publish_interval=0.05):
+        if fcntl is None or not hasattr(socket, "AF_UNIX"): raise RuntimeError("replicas need flock and Unix sockets")
+        self.root = root
+        self.bus = os.path.join(root, "bus")
+        os.makedirs(self.bus, exist_ok=True)
+        self.poll_interval = poll_interval
+        self.peer_refresh = peer_refresh
+        self.publish_interval = publish_interval
+        self.id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.address = os.path.join(self.bus, f"{self.id}.sock")
+        self._inbox = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._inbox.bind(self.address)
+        self._inbox.settimeout(poll_interval)
+        self._outbox = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._outbox.setblocking(False)
+        self._lock = threading.Lock()
+        self._watchers = {}    # classroom -> [callback(gen), ...]
+        self._peers, self._peers_at = [], 0.0
+        self._published = {}   # classroom -> [monotonic time of last send, latest gen, send scheduled]
+        self.sent = self.received = 0
+        threading.Thread(target=self._listen, name="classroom-replicas", daemon=True).start()
+
+    # --- Generation counter & locking ---
+    def _gen_file(self, classroom):
+        return os.path.join(self.root, quote(classroom, safe="") + ".gen")
+
+    def _log_file(self, classroom):
+        return os.path.join(self.root, quote(classroom, safe="") + ".log")
+
+    @contextmanager
+    def _locked(self, classroom, mode):
+        fd = os.open(self._gen_file(classroom), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+            yield fd
+        finally: os.close(fd)   # closing drops the lock
+
+    def _read(self, fd):
+        data = os.pread(fd, GEN.size, 0)
+        return GEN.unpack(data)[0] if len(data) == GEN.size else 0
+
+    @contextmanager
+    def shared(self, classroom):
+        """Hold the classroom's shared lock (no writer active); yields the generation."""
+        with self._locked(classroom, fcntl.LOCK_SH) as fd: yield self._read(fd)
+
+    @contextmanager
+    def exclusive(self, classroom):
+        """Hold the classroom's exclusive lock; yields {"gen", "op": None}.
+
+        The writer sets "op" to a JSON-able [name, *args] it can replay (None
+        means "reload"). On exit the change is logged, the generation bumped,
+        the lock released and the other replicas told; "gen" and "offset"
+        are left at the new generation and the log position after it.
+        """
+        with self._locked(classroom, fcntl.LOCK_EX) as fd:
+            change = {"gen": self._read(fd), "op": None}
+            try: yield change
+            finally:
+                change["gen"] += 1
+                with open(self._log_file(classroom), "ab") as log:
+                    if log.tell() > LOG_BYTES: log.truncate(0)
+                    log.write(json.dumps([change["gen"], change["op"]]).encode() + b"\n")
+                    log.flush()
+                    change["offset"] = os.fstat(log.fileno()).st_size
+                os.pwrite(fd, GEN.pack(change["gen"]), 0)
+        self.publish(classroom, change["gen"])
+
+    def changes(self, classroom, offset, since):
+        """Ops logged after generation `since`, starting at byte `offset`: (ops, new offset).
+
+        ops is None when the log can't bridge the gap (it started over, or
+        `offset` is stale); the caller reloads instead. Call with a lock held.
+        """
+        try:
+            with open(self._log_file(classroom), "rb") as log:
+                log.seek(offset)
+                data = log.read()
+        except OSError: return None, 0
+        ops, expected = [], since + 1
+        for line in data.splitlines():
+            try: gen, op = json.loads(line)
+            except (ValueError, TypeError): return None, offset + len(data)
+            if gen != expected: return None, offset + len(data)
+            ops.append(op)
+            expected += 1
+        return ops, offset + len(data)
+
+    def log_end(self, classroom):
+        try: return os.path.getsize(self._log_file(classroom))
+        except OSError: return 0
+
+    def generation(self, classroom):
+        try:
+            fd = os.open(self._gen_file(classroom), os.O_RDONLY)
+        except FileNotFoundError: return 0
+        try: return self._read(fd)
+        finally: os.close(fd)
+
+    # --- Pub/sub ---
+    def peers(self):
+        now = time.monotonic()
+        if now - self._peers_at > self.peer_refresh:
+            with os.scandir(self.bus) as entries:
+                self._peers = [e.path for e in entries if e.name.endswith(".sock") and e.path != self.address]
+            self._peers_at = now
+        return self._peers
+
+    def publish(self, classroom, gen):
+        """Announce `gen`, at most once per `publish_interval` per classroom.
+
+        Under a burst of writes the announcements coalesce: the first goes out
+        at once, the rest are folded into one trailing send of the latest gen.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._published.setdefault(classroom, [0.0, 0, False])
+            state[1] = max(state[1], gen)
+            if state[2]: return
+            wait = state[0] + self.publish_interval - now
+            if wait > 0:
+                state[2] = True
+                timer = threading.Timer(wait, self._publish_latest, (classroom,))
+                timer.daemon = True
+                timer.start()
+                return
+            state[0] = now
+        self._send(classroom, gen)
+
+    def _publish_latest(self, classroom):
+        with self._lock:
+            state = self._published[classroom]
+            state[0], state[2] = time.monotonic(), False
+            gen = state[1]
+        self._send(classroom, gen)
+
+    def _send(self, classroom, gen):
+        message = json.dumps({"classroom": classroom, "gen": gen}).encode()
+        for peer in self.peers():
+            try:
+                self._outbox.sendto(message, peer)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The replica is gone; its socket file is left behind
+                try: os.unlink(peer)
+                except OSError: pass
+                self._peers_at = 0.0
+            except OSError: pass   # its queue is full: the poll catches it up
+
+    def watch(self, classroom, callback):
+        """Call `callback(gen)` (from the listener thread) when another replica changes `classroom`."""
+        with self._lock: self._watchers.setdefault(classroom, []).append(callback)
+
+    def _notify(self, classroom, gen):
+        with self._lock: callbacks = list(self._watchers.get(classroom, ()))
+        for callback in callbacks:
+            try: callback(gen)
+            except Exception: pass
+
+    def _listen(self):
+        polled = time.monotonic()
+        while True:
+            try:
+                message = json.loads(self._inbox.recv(4096))
+                self.received += 1
+                self._notify(message["classroom"], message["gen"])
+            except socket.timeout: pass
+            except OSError:
+                if self._inbox.fileno() == -1: return   # closed
+                continue
+            except (ValueError, KeyError): continue
+            if time.monotonic() - polled >= self.poll_interval:
+                polled = time.monotonic()
+                with self._lock: classrooms = list(self._watchers)
+                for classroom in classrooms: self._notify(classroom, self.generation(classroom))
+
+    def close(self):
+        self._inbox.close()
+        try: os.unlink(self.address)
+        except OSError: pass
@@ -0,0 +1,171 @@
+"""End-of-term reports for every classroom, rendered in a process pool.
+
+    python reports.py [--out DIR] [--workers N]
+
+For each classroom, under `<out>/<classroom>/`:
+
+    report.csv           Rank, Name, Score, Battles, Group Points (one row per student)
+    report.html          class summary and the same table
+    students/<name>.html one page per student
+
+plus `<out>/index.html` linking every class. Each worker process opens its
+own storage (`open_storage()`, from the same environment and working
+directory) and streams one classroom's rows from it; nothing is loaded into
+pandas and nothing is written back. Workers run at a lower CPU priority, one
+fewer than the cores available, so live sessions keep a core to themselves.
+
+The app starts this file as a child process (`ExportJob`) rather than a pool
+of its own: under `streamlit run` the app script is `__main__`, and spawned
+workers would execute it again.
+"""
+import argparse
+import csv
+import html
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import quote
+
+from leaderboard import Leaderboard
+from storage import open_storage
+
+PAGE = """<!doctype html><html><head><meta charset="utf-8"><title>{title}</title><style>
+body {{ font-family: sans-serif; margin: 2em; color: #2c3e50; }}
+table {{ border-collapse: collapse; }} th, td {{ padding: 4px 12px; border-bottom: 1px solid #eee; text-align: left; }}
+td:nth-child(n+3) {{ text-align: right; }} .big {{ font-size: 2em; font-weight: bold; }}
+</style></head><body>{body}</body></html>
+"""
+
+_storage = None   # per worker process
+
+
+def _init_worker():
+    global _storage
+    if hasattr(os, "nice"): os.nice(10)   # live sessions first
+    _storage = open_storage()
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) - 1)
+
+def _file_name(name):
+    return quote(name, safe="") + ".html"
+
+def export_classroom(classroom, out_dir):
+    """Write one classroom's reports; returns (classroom, students written)."""
+    storage = _storage or open_storage()
+    battles, group_points, battle_ids = Counter(), Counter(), set()
+    for battle, members, score in storage.iter_battle_groups(classroom):
+        battle_ids.add(battle)
+        for name in members:
+            battles[name] += 1
+            group_points[name] += score or 0
+    students, scores = [], {}
+    for name, score in storage.iter_students(classroom):
+        students.append(name)
+        scores[name] = score
+    ranking = Leaderboard(students, scores).page(0, len(students))
+
+    class_dir = os.path.join(out_dir, quote(classroom, safe=""))
+    os.makedirs(os.path.join(class_dir, "students"), exist_ok=True)
+    title = html.escape(classroom)
+    total = sum(scores.values())
+    table = []
+    with open(os.path.join(class_dir, "report.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Rank", "Name", "Score", "Battles", "Group Points"])
+        for rank, name, score in ranking:
+            row = (rank, name, score, battles[name], group_points[name])
+            writer.writerow(row)
+            esc = html.escape(name)
+            table.append(f'<tr><td>{rank}</td><td><a href="students/{quote(_file_name(name))}">{esc}</a></td>'
+                         f"<td>{score}</td><td>{row[3]}</td><td>{row[4]}</td></tr>")
+            body = (f"<h1>{esc}</h1><p>{title}</p><p class='big'>{score} pts</p>"
+                    f"<p>Rank {rank} of {len(ranking)} · class average {total / len(ranking):.1f}</p>"
+                    f"<p>Group battles: {row[3]} · group points: {row[4]}</p>")
+            with open(os.path.join(class_dir, "students", _file_name(name)), "w", encoding="utf-8") as page:
+                page.write(PAGE.format(title=f"{esc} · {title}", body=body))
+    top = ", ".join(html.escape(name) for _, name, _ in ranking[:3])
+    body = (f"<h1>{title}</h1><p>{len(ranking)} students · {total} points · average "
+            f"{total / len(ranking) if ranking else 0:.1f} · {len(battle_ids)} group battles</p><p>Top: {top or '–'}</p>"
+            "<table><thead><tr><th>Rank</th><th>Name</th><th>Score</th><th>Battles</th><th>Group Points</th></tr></thead>"
+            f"<tbody>{''.join(table)}</tbody></table>")
+    with open(os.path.join(class_dir, "report.html"), "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title=title, body=body))
+    return classroom, len(ranking)
+
+def export_all(out_dir, classrooms, workers=None, progress=None):
+    """Export `classrooms` in a process pool; `progress(done, total, students)` after each one."""
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    counts = {}
+    # spawn, not fork: workers start clean of the parent's threads and connections
+    with ProcessPoolExecutor(workers or default_workers(), mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(export_classroom, classroom, out_dir) for classroom in classrooms]
+        for future in as_completed(futures):
+            classroom, students = future.result()
+            counts[classroom] = students
+            if progress: progress(len(counts), len(classrooms), sum(counts.values()))
+    links = "".join(f'<li><a href="{quote(quote(c, safe=""))}/report.html">{html.escape(c)}</a> ({counts[c]} students)</li>'
+                    for c in sorted(counts))
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title="Term reports", body=f"<h1>Term reports</h1><ul>{links}</ul>"))
+    seconds = time.perf_counter() - t0
+    students = sum(counts.values())
+    return {"out_dir": out_dir, "classrooms": len(counts), "students": students, "seconds": seconds,
+            "classrooms_per_s": len(counts) / seconds, "students_per_s": students / seconds}
+
+
+class ExportJob:
+    """`python reports.py --progress` in a child process, with progress any session can read."""
+    def __init__(self, out_dir, workers=None):
+        self.out_dir = out_dir
+        self.total, self.done, self.students = 0, 0, 0
+        self.started = time.time()
+        self.result = self.error = None
+        command = [sys.executable, os.path.abspath(__file__), "--out", out_dir, "--progress"]
+        if workers: command += ["--workers", str(workers)]
+        # One pipe for both streams: a separate stderr pipe could fill up while we wait on stdout
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        self._thread = threading.Thread(target=self._follow, name="term-reports", daemon=True)
+        self._thread.start()
+
+    def _follow(self):
+        last_output = None   # the last line that isn't progress, e.g. a traceback's final line
+        for line in self._process.stdout:
+            try: message = json.loads(line)
+            except ValueError: message = None
+            if not isinstance(message, dict):
+                if line.strip(): last_output = line.strip()
+            elif "seconds" in message: self.result = message
+            else: self.total, self.done, self.students = message["total"], message["done"], message["students"]
+        if self._process.wait() != 0 or self.result is None:
+            self.error = last_output or f"exit code {self._process.returncode}"
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join("classroom_reports", time.strftime("%Y%m%d-%H%M%S")))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--progress", action="store_true", help="one JSON line per finished class, then the summary")
+    args = parser.parse_args()
+    progress = None
+    if args.progress:
+        progress = lambda done, total, students: print(json.dumps({"done": done, "total": total, "students": students}), flush=True)
+    classrooms = open_storage().list_classrooms()
+    if progress: progress(0, len(classrooms), 0)
+    result = export_all(args.out, classrooms, args.workers, progress)
+    print(json.dumps(result, indent=None if args.progress else 2))
+
+if __name__ == "__main__":
+    main()
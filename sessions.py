@@ -0,0 +1,133 @@
+"""Per-session memory accounting, stale-key collection and idle-session spill.
+
+Every run registers its session with the process-wide `SessionMemory`
+(`touch`). A sweep, at most every `sweep_interval` seconds, measures each
+session's state and evicts the heavy data of sessions that have been idle
+for `idle_seconds`, or, while the total is over `budget_bytes`, of the
+least recently seen sessions idle for at least `min_idle_seconds`:
+
+- `rebuildable` keys (copies of the shared classroom) are simply dropped;
+  the session reloads them from the store when it wakes up;
+- keys accepted by `spill(key)` (per-session quiz state) are written to
+  `<spill_dir>/<session>.json` and read back on the next `touch`.
+
+Eviction and `touch` share one lock, so a session is never evicted halfway
+through waking up.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+ORPHAN_SECONDS = 24 * 3600   # spill files left by an earlier process are removed after this
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by `obj` and everything it contains (shared objects counted once)."""
+    seen = set() if seen is None else seen
+    size, stack = 0, [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen: continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)): stack.extend(obj)
+    return size
+
+
+class SessionMemory:
+    def __init__(self, spill_dir, budget_bytes=64 * 1024 * 1024, idle_seconds=600, min_idle_seconds=60,
+                 sweep_interval=30, rebuildable=(), spill=lambda key: False):
+        self.spill_dir = spill_dir
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.min_idle_seconds = min_idle_seconds
+        self.sweep_interval = sweep_interval
+        self.rebuildable = frozenset(rebuildable)
+        self.spill = spill
+        self._lock = threading.Lock()
+        self._sessions = {}   # session -> {"state", "seen", "bytes", "spilled"}
+        self._swept = time.monotonic()
+        self.evictions = 0
+        os.makedirs(spill_dir, exist_ok=True)
+        cutoff = time.time() - ORPHAN_SECONDS
+        for entry in os.scandir(spill_dir):
+            if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff: os.remove(entry.path)
+
+    def _spill_file(self, session):
+        return os.path.join(self.spill_dir, f"{session}.json")
+
+    def touch(self, session, state):
+        """Mark `session` active; restore its state if it was evicted. True if it was."""
+        with self._lock:
+            entry = self._sessions.get(session)
+            if entry is None: entry = self._sessions[session] = {"bytes": 0, "spilled": False}
+            entry["state"], entry["seen"] = state, time.monotonic()
+            if not entry["spilled"]: return False
+            entry["spilled"] = False
+            path = self._spill_file(session)
+            try:
+                with open(path, encoding="utf-8") as f: saved = json.load(f)
+                os.remove(path)
+            except (OSError, ValueError): saved = {}
+            for key, value in saved.items():
+                if key not in state: state[key] = value
+            return True
+
+    def collect(self, state, prefixes, live):
+        """Delete keys starting with one of `prefixes` that are not in `live`; return how many."""
+        stale = [key for key in list(state.filtered_state) if key.startswith(prefixes) and key not in live]
+        for key in stale: del state[key]
+        return len(stale)
+
+    def _evict(self, session, entry):
+        state, saved = entry["state"], {}
+        for key, value in state.filtered_state.items():
+            if key in self.rebuildable: del state[key]
+            elif self.spill(key):
+                saved[key] = value
+                del state[key]
+        if saved:
+            with open(self._spill_file(session), "w", encoding="utf-8") as f: json.dump(saved, f)
+        entry["spilled"], entry["bytes"] = True, deep_size(state.filtered_state)
+        self.evictions += 1
+
+    def sweep(self, current=None, force=False):
+        """Measure every session and evict idle ones other than `current` (throttled to `sweep_interval`)."""
+        now = time.monotonic()
+        if not force and now - self._swept < self.sweep_interval: return
+        self._swept = now
+        with self._lock:
+            for session, entry in list(self._sessions.items()):
+                idle = now - entry["seen"]
+                # The browser is long gone; a spilled session keeps its entry (and
+                # file) as long as orphan files are kept, so touch still restores it
+                if idle > (ORPHAN_SECONDS if entry["spilled"] else 6 * self.idle_seconds):
+                    del self._sessions[session]
+                    if entry["spilled"] and os.path.exists(self._spill_file(session)): os.remove(self._spill_file(session))
+                    continue
+                if entry["spilled"]: continue
+                try: entry["bytes"] = deep_size(entry["state"].filtered_state)
+                except RuntimeError: continue   # changed while measuring; next sweep
+                if idle > self.idle_seconds and session != current: self._evict(session, entry)
+            total = sum(e["bytes"] for e in self._sessions.values())
+            by_age = sorted((e["seen"], s) for s, e in self._sessions.items() if not e["spilled"] and s != current)
+            for seen, session in by_age:
+                if total <= self.budget_bytes or now - seen < self.min_idle_seconds: break
+                entry = self._sessions[session]
+                total -= entry["bytes"]
+                self._evict(session, entry)
+                total += entry["bytes"]
+
+    def report(self):
+        """[{"session", "bytes", "idle", "spilled"}, ...], largest first."""
+        now = time.monotonic()
+        with self._lock:
+            rows = [{"session": s, "bytes": e["bytes"], "idle": now - e["seen"], "spilled": e["spilled"]}
+                    for s, e in self._sessions.items()]
+        return sorted(rows, key=lambda r: -r["bytes"])
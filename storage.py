@@ -0,0 +1,512 @@
+"""Storage backends for rosters, scores and group battles.
+
+Both backends expose the same methods, each taking the classroom name first:
+
+    list_classrooms()
+    load_roster(classroom, default_students) -> (students, scores)
+    save_roster(classroom, students, scores)
+    record_score(classroom, name, delta, session)
+    load_groups(classroom) -> (groups, group_scores)
+    load_battles(classroom, limit) -> [groups, ...]   # oldest first
+    start_battle(classroom, groups)
+    add_group_points(classroom, points, session)  # points: [(group_idx, delta), ...], one write
+    reset_group_scores(classroom)
+    load_seats(classroom) -> (layout, seats)
+    save_seats(classroom, layout, seats)
+    record_pick(classroom, name, session)
+    load_picks(classroom, limit) -> [name, ...]   # oldest first
+    load_live(classroom) -> dict                  # small live state: the timer, the last pick
+    save_live(classroom, live)
+    iter_students(classroom) -> (name, score), ...                # roster order, read-only
+    iter_battle_groups(classroom) -> (battle, members, score), ... # every battle; score None if unknown
+    reset(classroom)
+
+`CsvStorage` is the original single-classroom CSV file (plus the score
+journal); `SqliteStorage` holds any number of classrooms in one WAL-mode
+database. `open_storage()` picks one from the environment.
+"""
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try: import fcntl
+except ImportError: fcntl = None   # Windows: single-process use only
+
+DEFAULT_CLASSROOM = "default"
+
+
+# --- 📄 CSV BACKEND ---
+class CsvStorage:
+    """Single-classroom storage in flat files next to the app.
+
+    Single-point score changes are appended to `journal_file` as
+    (timestamp, session, name, delta) rows instead of rewriting `data_file`.
+    `data_file` is the snapshot; load_roster replays the journal on top of it,
+    and the journal is folded back into the snapshot once it grows past
+    `compact_bytes`. All file access holds an exclusive lock on
+    `<data_file>.lock` so concurrent sessions (and processes) never interleave
+    writes.
+    """
+    multi_classroom = False
+
+    def __init__(self, data_file="classroom_data.csv", journal_file="classroom_journal.csv",
+                 groups_file="classroom_groups.json", seats_file="classroom_seats.json", picks_file="classroom_picks.csv",
+                 live_file="classroom_live.json", compact_bytes=64 * 1024, history_limit=20):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.groups_file = groups_file
+        self.seats_file = seats_file
+        self.picks_file = picks_file
+        self.live_file = live_file
+        self.lock_file = data_file + ".lock"
+        self.compact_bytes = compact_bytes
+        self.history_limit = history_limit
+        self._default_students = []   # roster to compact against before the first snapshot exists
+
+    @contextmanager
+    def _lock(self):
+        with open(self.lock_file, "a") as lock_file:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try: yield
+            finally:
+                if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_snapshot(self, student_list, score_dict):
+        tmp = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Name", "Score"])
+            writer.writerows((name, score_dict.get(name, 0)) for name in student_list)
+        os.replace(tmp, self.data_file)
+        # Everything in the journal is now part of the snapshot
+        open(self.journal_file, "w").close()
+
+    def _read_snapshot(self, default_students):
+        default_scores = {name: 0 for name in default_students}
+        if os.path.exists(self.data_file):
+            try:
+                with open(self.data_file, newline="", encoding="utf-8") as f:
+                    reader = csv.DictReader(f)
+                    if not reader.fieldnames or "Name" not in reader.fieldnames or "Score" not in reader.fieldnames:
+                        return default_students, default_scores
+                    rows = [(row["Name"], int(float(row["Score"] or 0))) for row in reader]
+                if not rows: return default_students, default_scores
+                loaded_students = [name for name, _ in rows]
+                loaded_scores = dict(rows)
+                return loaded_students, loaded_scores
+            except: return default_students, default_scores
+        else: return default_students, default_scores
+
+    def _replay_journal(self, score_dict):
+        if not os.path.exists(self.journal_file): return
+        with open(self.journal_file, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                try:
+                    _, _, name, delta = row
+                    delta = int(delta)
+                except ValueError: continue   # torn line from a crash mid-append
+                # Events for students no longer on the roster are dropped
+                if name in score_dict: score_dict[name] += delta
+
+    def list_classrooms(self):
+        return [DEFAULT_CLASSROOM]
+
+    def load_roster(self, classroom, default_students):
+        self._default_students = default_students
+        with self._lock():
+            first_visit = not os.path.exists(self.data_file)
+            students, scores = self._read_snapshot(default_students)
+            self._replay_journal(scores)
+            # Store the default roster, as SqliteStorage does, so readers that
+            # don't know it (iter_students, reports.py) see the class too
+            if first_visit and students: self._write_snapshot(students, scores)
+        return students, scores
+
+    def save_roster(self, classroom, students, scores):
+        with self._lock(): self._write_snapshot(students, scores)
+
+    def record_score(self, classroom, name, delta, session):
+        """Append one score event; O(1) regardless of roster size."""
+        with self._lock():
+            with open(self.journal_file, "a+", newline="", encoding="utf-8") as f:
+                # After a torn append, start on a fresh line rather than glue onto it
+                size = os.fstat(f.fileno()).st_size
+                if size and os.pread(f.fileno(), 1, size - 1) != b"\n": f.write("\n")
+                csv.writer(f).writerow([f"{time.time():.3f}", session, name, delta])
+                f.flush()
+                os.fsync(f.fileno())
+                journal_size = f.tell()
+            if journal_size > self.compact_bytes:
+                students, scores = self._read_snapshot(self._default_students)
+                self._replay_journal(scores)
+                self._write_snapshot(students, scores)
+
+    def load_groups(self, classroom):
+        try:
+            with open(self.groups_file, encoding="utf-8") as f: data = json.load(f)
+            return data["groups"], {int(k): v for k, v in data["scores"].items()}
+        except (OSError, ValueError, KeyError): return [], {}
+
+    def iter_students(self, classroom):
+        if not os.path.exists(self.data_file): return
+        with self._lock():
+            students, scores = self._read_snapshot([])
+            self._replay_journal(scores)
+        for name in students: yield name, scores[name]
+
+    def iter_battle_groups(self, classroom):
+        # Only the current battle's scores are kept; earlier battles give membership only
+        groups, group_scores = self.load_groups(classroom)
+        history = self.load_battles(classroom, self.history_limit)
+        for battle, battle_groups in enumerate(history):
+            current = battle == len(history) - 1 and battle_groups == groups
+            for idx, members in enumerate(battle_groups):
+                yield battle, members, group_scores.get(idx, 0) if current else None
+
+    def load_battles(self, classroom, limit):
+        try:
+            with open(self.groups_file, encoding="utf-8") as f: history = json.load(f).get("history", [])
+        except (OSError, ValueError, AttributeError): return []
+        return history[-limit:]
+
+    def _save_groups(self, groups, group_scores, history=None):
+        if history is None: history = self.load_battles(None, self.history_limit)
+        tmp = f"{self.groups_file}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"groups": groups, "scores": group_scores, "history": history}, f)
+        os.replace(tmp, self.groups_file)
+
+    def start_battle(self, classroom, groups):
+        with self._lock():
+            # Past battles are kept (up to history_limit) so repeat pairings can be avoided
+            history = self.load_battles(classroom, self.history_limit)
+            if groups: history = (history + [groups])[-self.history_limit:]
+            self._save_groups(groups, {i: 0 for i in range(len(groups))}, history)
+
+    def add_group_points(self, classroom, points, session):
+        with self._lock():
+            groups, group_scores = self.load_groups(classroom)
+            for group_idx, delta in points: group_scores[group_idx] = group_scores.get(group_idx, 0) + delta
+            self._save_groups(groups, group_scores)
+
+    def reset_group_scores(self, classroom):
+        with self._lock():
+            groups, _ = self.load_groups(classroom)
+            self._save_groups(groups, {i: 0 for i in range(len(groups))})
+
+    def load_seats(self, classroom):
+        try:
+            with open(self.seats_file, encoding="utf-8") as f: data = json.load(f)
+            return data["layout"], data["seats"]
+        except (OSError, ValueError, KeyError): return None, []
+
+    def save_seats(self, classroom, layout, seats):
+        with self._lock():
+            tmp = f"{self.seats_file}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: json.dump({"layout": layout, "seats": seats}, f)
+            os.replace(tmp, self.seats_file)
+
+    def record_pick(self, classroom, name, session):
+        with self._lock():
+            with open(self.picks_file, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow([f"{time.time():.3f}", session, name])
+
+    def load_picks(self, classroom, limit):
+        if not os.path.exists(self.picks_file): return []
+        with self._lock(), open(self.picks_file, newline="", encoding="utf-8") as f:
+            picks = deque((row[2] for row in csv.reader(f) if len(row) == 3), maxlen=limit)
+        return list(picks)
+
+    def load_live(self, classroom):
+        try:
+            with open(self.live_file, encoding="utf-8") as f: return json.load(f)
+        except (OSError, ValueError): return {}
+
+    def save_live(self, classroom, live):
+        with self._lock():
+            tmp = f"{self.live_file}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: json.dump(live, f)
+            os.replace(tmp, self.live_file)
+
+    def reset(self, classroom):
+        with self._lock():
+            for f in (self.data_file, self.journal_file, self.groups_file, self.seats_file, self.picks_file, self.live_file):
+                if os.path.exists(f): os.remove(f)
+
+
+# --- 🗄️ SQLITE BACKEND ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classrooms (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS students (
+    classroom_id INTEGER NOT NULL REFERENCES classrooms(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (classroom_id, name)
+);
+CREATE TABLE IF NOT EXISTS score_events (
+    id INTEGER PRIMARY KEY,
+    classroom_id INTEGER NOT NULL REFERENCES classrooms(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    delta INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    session TEXT
+);
+CREATE INDEX IF NOT EXISTS score_events_by_student ON score_events (classroom_id, name, ts);
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY,
+    classroom_id INTEGER NOT NULL REFERENCES classrooms(id) ON DELETE CASCADE,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS battles_by_classroom ON battles (classroom_id, id);
+CREATE TABLE IF NOT EXISTS battle_groups (
+    battle_id INTEGER NOT NULL REFERENCES battles(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    members TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (battle_id, idx)
+);
+CREATE TABLE IF NOT EXISTS picks (
+    id INTEGER PRIMARY KEY,
+    classroom_id INTEGER NOT NULL REFERENCES classrooms(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    ts REAL NOT NULL,
+    session TEXT
+);
+CREATE INDEX IF NOT EXISTS picks_by_classroom ON picks (classroom_id, id);
+CREATE TABLE IF NOT EXISTS seat_maps (
+    classroom_id INTEGER PRIMARY KEY REFERENCES classrooms(id) ON DELETE CASCADE,
+    layout TEXT,
+    seats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS live_state (
+    classroom_id INTEGER PRIMARY KEY REFERENCES classrooms(id) ON DELETE CASCADE,
+    data TEXT NOT NULL
+);
+"""
+
+class SqliteStorage:
+    """Many classrooms in one WAL-mode SQLite database.
+
+    Connections come from a small pool so concurrent sessions read in
+    parallel. Writes go through a group commit: whichever thread finds the
+    queue idle becomes the leader and commits every write queued so far in a
+    single transaction, so N simultaneous clicks cost one fsync, not N.
+    """
+    multi_classroom = True
+
+    def __init__(self, path="classroom.db", pool_size=4):
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(pool_size): self._pool.put(self._connect())
+        with self._conn() as conn: conn.executescript(SCHEMA)
+        self._pending = []
+        self._batch_lock = threading.Lock()
+        self._flushing = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._pool.get()
+        try: yield conn
+        finally: self._pool.put(conn)
+
+    @contextmanager
+    def _transaction(self):
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _write(self, fn):
+        """Run `fn(conn)` inside the next group-committed transaction."""
+        item = {"fn": fn, "done": threading.Event(), "error": None}
+        with self._batch_lock:
+            self._pending.append(item)
+            leader = not self._flushing
+            if leader: self._flushing = True
+        if leader:
+            while True:
+                with self._batch_lock:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._flushing = False
+                        break
+                try:
+                    with self._transaction() as conn:
+                        for it in batch:
+                            conn.execute("SAVEPOINT op")
+                            try:
+                                it["fn"](conn)
+                                conn.execute("RELEASE op")
+                            except Exception as e:   # one bad write must not sink the batch
+                                conn.execute("ROLLBACK TO op")
+                                conn.execute("RELEASE op")
+                                it["error"] = e
+                except Exception as e:
+                    for it in batch: it["error"] = it["error"] or e
+                for it in batch: it["done"].set()
+        item["done"].wait()
+        if item["error"]: raise item["error"]
+
+    def _classroom_id(self, conn, classroom):
+        conn.execute("INSERT OR IGNORE INTO classrooms (name) VALUES (?)", (classroom,))
+        return conn.execute("SELECT id FROM classrooms WHERE name = ?", (classroom,)).fetchone()[0]
+
+    def list_classrooms(self):
+        with self._conn() as conn:
+            return [r[0] for r in conn.execute("SELECT name FROM classrooms ORDER BY name")] or [DEFAULT_CLASSROOM]
+
+    def load_roster(self, classroom, default_students):
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT s.name, s.score FROM students s JOIN classrooms c ON c.id = s.classroom_id "
+                "WHERE c.name = ? ORDER BY s.position", (classroom,)).fetchall()
+        if not rows:
+            # First visit: store the default roster so score updates have rows to hit
+            scores = {name: 0 for name in default_students}
+            if default_students: self.save_roster(classroom, default_students, scores)
+            return default_students, scores
+        return [r[0] for r in rows], dict(rows)
+
+    def save_roster(self, classroom, students, scores):
+        def op(conn):
+            cid = self._classroom_id(conn, classroom)
+            conn.execute("DELETE FROM students WHERE classroom_id = ?", (cid,))
+            conn.executemany("INSERT INTO students (classroom_id, name, position, score) VALUES (?, ?, ?, ?)",
+                             [(cid, name, pos, scores.get(name, 0)) for pos, name in enumerate(students)])
+        self._write(op)
+
+    def record_score(self, classroom, name, delta, session):
+        def op(conn):
+            cid = self._classroom_id(conn, classroom)
+            conn.execute("UPDATE students SET score = score + ? WHERE classroom_id = ? AND name = ?", (delta, cid, name))
+            conn.execute("INSERT INTO score_events (classroom_id, name, delta, ts, session) VALUES (?, ?, ?, ?, ?)",
+                         (cid, name, delta, time.time(), session))
+        self._write(op)
+
+    def _current_battle(self, conn, cid):
+        row = conn.execute("SELECT id FROM battles WHERE classroom_id = ? ORDER BY id DESC LIMIT 1", (cid,)).fetchone()
+        return row[0] if row else None
+
+    def load_groups(self, classroom):
+        with self._conn() as conn:
+            row = conn.execute("SELECT id FROM classrooms WHERE name = ?", (classroom,)).fetchone()
+            battle = row and self._current_battle(conn, row[0])
+            if not battle: return [], {}
+            rows = conn.execute("SELECT idx, members, score FROM battle_groups WHERE battle_id = ? ORDER BY idx", (battle,)).fetchall()
+        return [json.loads(r[1]) for r in rows], {r[0]: r[2] for r in rows}
+
+    def iter_students(self, classroom):
+        with self._conn() as conn:
+            yield from conn.execute(
+                "SELECT s.name, s.score FROM students s JOIN classrooms c ON c.id = s.classroom_id "
+                "WHERE c.name = ? ORDER BY s.position", (classroom,))
+
+    def iter_battle_groups(self, classroom):
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT g.battle_id, g.members, g.score FROM battle_groups g JOIN battles b ON b.id = g.battle_id "
+                "JOIN classrooms c ON c.id = b.classroom_id WHERE c.name = ? ORDER BY g.battle_id, g.idx", (classroom,))
+            for battle, members, score in rows: yield battle, json.loads(members), score
+
+    def load_battles(self, classroom, limit):
+        with self._conn() as conn:
+            battles = conn.execute(
+                "SELECT b.id FROM battles b JOIN classrooms c ON c.id = b.classroom_id "
+                "WHERE c.name = ? AND EXISTS (SELECT 1 FROM battle_groups g WHERE g.battle_id = b.id) "
+                "ORDER BY b.id DESC LIMIT ?", (classroom, limit)).fetchall()
+            history = []
+            for (battle,) in reversed(battles):
+                rows = conn.execute("SELECT members FROM battle_groups WHERE battle_id = ? ORDER BY idx", (battle,))
+                history.append([json.loads(r[0]) for r in rows])
+        return history
+
+    def start_battle(self, classroom, groups):
+        # Past battles are kept, so the history of who worked with whom survives
+        def op(conn):
+            cid = self._classroom_id(conn, classroom)
+            battle = conn.execute("INSERT INTO battles (classroom_id, created) VALUES (?, ?)", (cid, time.time())).lastrowid
+            conn.executemany("INSERT INTO battle_groups (battle_id, idx, members) VALUES (?, ?, ?)",
+                             [(battle, i, json.dumps(g)) for i, g in enumerate(groups)])
+        self._write(op)
+
+    def add_group_points(self, classroom, points, session):
+        def op(conn):
+            battle = self._current_battle(conn, self._classroom_id(conn, classroom))
+            conn.executemany("UPDATE battle_groups SET score = score + ? WHERE battle_id = ? AND idx = ?",
+                             [(delta, battle, group_idx) for group_idx, delta in points])
+        self._write(op)
+
+    def reset_group_scores(self, classroom):
+        def op(conn):
+            battle = self._current_battle(conn, self._classroom_id(conn, classroom))
+            conn.execute("UPDATE battle_groups SET score = 0 WHERE battle_id = ?", (battle,))
+        self._write(op)
+
+    def load_seats(self, classroom):
+        with self._conn() as conn:
+            row = conn.execute("SELECT m.layout, m.seats FROM seat_maps m JOIN classrooms c ON c.id = m.classroom_id "
+                               "WHERE c.name = ?", (classroom,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, [])
+
+    def save_seats(self, classroom, layout, seats):
+        def op(conn):
+            conn.execute("INSERT OR REPLACE INTO seat_maps (classroom_id, layout, seats) VALUES (?, ?, ?)",
+                         (self._classroom_id(conn, classroom), layout, json.dumps(seats)))
+        self._write(op)
+
+    def record_pick(self, classroom, name, session):
+        def op(conn):
+            conn.execute("INSERT INTO picks (classroom_id, name, ts, session) VALUES (?, ?, ?, ?)",
+                         (self._classroom_id(conn, classroom), name, time.time(), session))
+        self._write(op)
+
+    def load_picks(self, classroom, limit):
+        with self._conn() as conn:
+            rows = conn.execute("SELECT p.name FROM picks p JOIN classrooms c ON c.id = p.classroom_id "
+                                "WHERE c.name = ? ORDER BY p.id DESC LIMIT ?", (classroom, limit)).fetchall()
+        return [r[0] for r in reversed(rows)]
+
+    def load_live(self, classroom):
+        with self._conn() as conn:
+            row = conn.execute("SELECT l.data FROM live_state l JOIN classrooms c ON c.id = l.classroom_id "
+                               "WHERE c.name = ?", (classroom,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_live(self, classroom, live):
+        def op(conn):
+            conn.execute("INSERT OR REPLACE INTO live_state (classroom_id, data) VALUES (?, ?)",
+                         (self._classroom_id(conn, classroom), json.dumps(live)))
+        self._write(op)
+
+    def reset(self, classroom):
+        def op(conn):
+            conn.execute("DELETE FROM classrooms WHERE name = ?", (classroom,))
+        self._write(op)
+
+
+def open_storage():
+    """Backend selected by CLASSROOM_STORAGE ('csv', the default, or 'sqlite')."""
+    if os.environ.get("CLASSROOM_STORAGE", "csv").lower() == "sqlite":
+        return SqliteStorage(os.environ.get("CLASSROOM_DB", "classroom.db"))
+    return CsvStorage()
@@ -0,0 +1,193 @@
+"""Lightweight run-time instrumentation, shared by every session in the process.
+
+- `span(name)`, `timed(name)` and `lap(name)` record how long a section of
+  the script took; the last `window` samples per span give p50/p95, plus
+  all-time count and sum.
+- `begin_run()` / `end_run()` bracket one full script run: they count reruns
+  per session, time the whole script, and run cProfile on a random
+  `profile_rate` fraction of runs, aggregating the samples. Only one run per
+  process is profiled at a time (Python 3.12+ allows one active profiler);
+  `cancel_run()` drops a run that ends early, as st.rerun() does.
+- `write_prometheus()` writes everything in the Prometheus text format to
+  `metrics_file` (atomically, at most every `export_interval` seconds when
+  called from `end_run`), for a local node-exporter textfile scraper.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+SESSION_IDLE_SECONDS = 3600   # sessions quiet this long drop out of the rerun counters
+
+
+def quantile(sorted_values, q):
+    if not sorted_values: return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class Telemetry:
+    def __init__(self, metrics_file=None, profile_rate=0.0, window=1000, export_interval=15.0):
+        self.metrics_file = metrics_file
+        self.profile_rate = profile_rate
+        self.window = window
+        self.export_interval = export_interval
+        self._lock = threading.Lock()
+        self._spans = {}           # name -> [deque of recent seconds, count, total seconds]
+        self._sessions = {}        # session -> {"full": n, "fragment": n, "seen": time}
+        self._profile = None       # pstats.Stats over every sampled run
+        self._profiled_runs = 0
+        self._profiling = None     # (thread, profiler) of the sampled run in progress
+        self._exported = 0.0
+        self._active = threading.local()
+
+    # --- Spans ---
+    def record(self, name, seconds):
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None: span = self._spans[name] = [deque(maxlen=self.window), 0, 0.0]
+            span[0].append(seconds)
+            span[1] += 1
+            span[2] += seconds
+
+    @contextmanager
+    def span(self, name):
+        t0 = time.perf_counter()
+        try: yield
+        finally: self.record(name, time.perf_counter() - t0)
+
+    def lap(self, name):
+        """Record the time since the run began or the previous lap as span `name`."""
+        run = getattr(self._active, "run", None)
+        if run is None: return
+        now = time.perf_counter()
+        self.record(name, now - run["lap"])
+        run["lap"] = now
+
+    def timed(self, name, session=None):
+        """Decorator: time every call as span `name`.
+
+        `session()` returns the session id during a fragment-only rerun (None
+        otherwise); the outermost timed call of such a rerun counts it.
+        """
+        def wrap(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                depth = getattr(self._active, "depth", 0)
+                if session and not depth:
+                    who = session()
+                    if who: self.count_rerun(who, "fragment")
+                self._active.depth = depth + 1
+                try:
+                    with self.span(name): return func(*args, **kwargs)
+                finally: self._active.depth = depth
+            return wrapper
+        return wrap
+
+    def spans(self):
+        """{name: {"p50", "p95", "count", "total"}} in seconds."""
+        with self._lock:
+            snapshot = {name: (sorted(s[0]), s[1], s[2]) for name, s in self._spans.items()}
+        return {name: {"p50": quantile(v, 0.5), "p95": quantile(v, 0.95), "count": n, "total": total}
+                for name, (v, n, total) in snapshot.items()}
+
+    # --- Runs & sessions ---
+    def count_rerun(self, session, kind="full"):
+        with self._lock:
+            counts = self._sessions.setdefault(session, {"full": 0, "fragment": 0, "seen": 0.0})
+            counts[kind] += 1
+            counts["seen"] = time.time()
+
+    def sessions(self):
+        with self._lock:
+            cutoff = time.time() - SESSION_IDLE_SECONDS
+            for session in [s for s, c in self._sessions.items() if c["seen"] < cutoff]: del self._sessions[session]
+            return {s: dict(c) for s, c in self._sessions.items()}
+
+    def _start_profiler(self):
+        with self._lock:
+            holder = self._profiling
+            if holder and not holder[0].is_alive():   # that run died with an error, and its thread with it
+                holder[1].disable()
+                holder = self._profiling = None
+            if holder: return None   # another session's run is being sampled
+            profiler = cProfile.Profile()
+            try: profiler.enable()
+            except ValueError: return None   # another profiling tool is active
+            self._profiling = (threading.current_thread(), profiler)
+            return profiler
+
+    def _stop_profiler(self, profiler):
+        profiler.disable()
+        with self._lock:
+            if self._profiling and self._profiling[1] is profiler: self._profiling = None
+
+    def begin_run(self, session):
+        # A run that stopped early never reached end_run; drop it first
+        self.cancel_run()
+        self.count_rerun(session)
+        profiler = None
+        if self.profile_rate and random.random() < self.profile_rate: profiler = self._start_profiler()
+        now = time.perf_counter()
+        self._active.run = {"start": now, "lap": now, "profiler": profiler}
+
+    def cancel_run(self):
+        """Forget this thread's run, unrecorded; call before ending the script early."""
+        run = getattr(self._active, "run", None)
+        self._active.run = None
+        if run and run["profiler"]: self._stop_profiler(run["profiler"])
+
+    def end_run(self):
+        run = getattr(self._active, "run", None)
+        if run is None: return
+        self._active.run = None
+        if run["profiler"]:
+            self._stop_profiler(run["profiler"])
+            with self._lock:
+                if self._profile is None: self._profile = pstats.Stats(run["profiler"], stream=io.StringIO())
+                else: self._profile.add(run["profiler"])
+                self._profiled_runs += 1
+        self.record("script", time.perf_counter() - run["start"])
+        if self.metrics_file and time.time() - self._exported > self.export_interval: self.write_prometheus()
+
+    def profile_report(self, limit=20):
+        """Top functions by cumulative time over all sampled runs, as text."""
+        with self._lock:
+            if self._profile is None: return ""
+            out = io.StringIO()
+            self._profile.stream = out
+            self._profile.sort_stats("cumulative").print_stats(limit)
+            return f"{self._profiled_runs} sampled runs\n" + out.getvalue()
+
+    # --- Export ---
+    def prometheus(self):
+        lines = ["# HELP classroom_span_seconds Time spent in each section of the app script.",
+                 "# TYPE classroom_span_seconds summary"]
+        for name, s in sorted(self.spans().items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines += [f'classroom_span_seconds{{span="{label}",quantile="0.5"}} {s["p50"]:.6f}',
+                      f'classroom_span_seconds{{span="{label}",quantile="0.95"}} {s["p95"]:.6f}',
+                      f'classroom_span_seconds_sum{{span="{label}"}} {s["total"]:.6f}',
+                      f'classroom_span_seconds_count{{span="{label}"}} {s["count"]}']
+        sessions = self.sessions()
+        lines += ["# HELP classroom_reruns_total Script reruns per session and kind (full or fragment).",
+                  "# TYPE classroom_reruns_total counter"]
+        for session, counts in sorted(sessions.items()):
+            for kind in ("full", "fragment"):
+                lines.append(f'classroom_reruns_total{{session="{session}",kind="{kind}"}} {counts[kind]}')
+        lines += ["# HELP classroom_active_sessions Sessions seen in the last hour.",
+                  "# TYPE classroom_active_sessions gauge", f"classroom_active_sessions {len(sessions)}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        path = path or self.metrics_file
+        self._exported = time.time()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: f.write(self.prometheus())
+        os.replace(tmp, path)   # scrapers never see a half-written file
+        return path
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from grouping import form_groups, group_quality, group_sizes, pair_counts, pair_key
+
+STUDENTS = [f"S{i}" for i in range(30)]
+_rng = random.Random(7)
+SCORES = {name: _rng.randint(0, 50) for name in STUDENTS}
+
+
+def form(students=STUDENTS, scores=SCORES, group_size=5, seed=0, **kwargs):
+    return form_groups(students, scores, group_size, rng=random.Random(seed), budget_s=10, max_swaps=5000, **kwargs)
+
+
+@pytest.mark.parametrize("n, group_size", [(1, 4), (10, 3), (29, 4), (30, 4), (30, 5), (7, 10)])
+def test_sizes_differ_by_at_most_one(n, group_size):
+    sizes = group_sizes(n, group_size)
+    assert sum(sizes) == n and max(sizes) - min(sizes) <= 1 and max(sizes) <= group_size
+    groups = form(STUDENTS[:n], group_size=group_size)
+    assert sorted(len(g) for g in groups) == sorted(sizes)
+    assert sorted(name for g in groups for name in g) == sorted(STUDENTS[:n])
+
+def test_empty_roster():
+    assert form([]) == []
+
+def test_totals_are_balanced():
+    groups = form()
+    totals = [sum(SCORES[name] for name in g) for g in groups]
+    assert max(totals) - min(totals) <= 2
+    shuffled = random.Random(8).sample(STUDENTS, len(STUDENTS))
+    naive = [shuffled[i:i + 5] for i in range(0, len(shuffled), 5)]
+    assert group_quality(groups, SCORES)["mean_spread"] < group_quality(naive, SCORES)["mean_spread"] / 10
+
+def test_repeat_partners_are_kept_apart():
+    last = form(seed=1)
+    pairs = pair_counts([last])
+    assert group_quality(last, SCORES, pairs)["repeat_pairs"] == len(pairs)
+    blind, again = form(seed=2), form(seed=2, pairs=pairs)
+    assert group_quality(again, SCORES, pairs)["repeat_pairs"] <= 2 < group_quality(blind, SCORES, pairs)["repeat_pairs"]
+    assert group_quality(again, SCORES)["mean_spread"] <= 2.0   # still balanced, if less tightly
+
+def test_pair_counts_use_sorted_keys():
+    counts = pair_counts([[["B", "A"]], [["A", "B", "C"]]])
+    assert counts[pair_key("B", "A")] == 2 and counts[pair_key("C", "A")] == 1
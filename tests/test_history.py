@@ -0,0 +1,72 @@
+from history import GROUP, POINT, RESET, UNDO, ScoreHistory
+
+
+def reset(history, scores):
+    """Record a reset the way ClassroomStore.reset_scores does."""
+    history.record([(name, -score) for name, score in scores.items() if score], RESET)
+
+def undo(history):
+    history.record(list(history.last_reset().items()), UNDO)
+
+
+def test_reset_and_undo_survive_a_reload(tmp_path):
+    history = ScoreHistory(tmp_path, "Class 1A")
+    history.record([("Ann", 3), ("Ben", 2)], POINT)
+    history.record([("Group 1", 4)], GROUP)
+    reset(history, {"Ann": 3, "Ben": 2})
+    assert history.last_reset() == {"Ann": 3, "Ben": 2}
+    assert history.term == {"Ann": 3, "Ben": 2}   # resets don't take back earned points
+    reloaded = ScoreHistory(tmp_path, "Class 1A")
+    assert reloaded.last_reset() == {"Ann": 3, "Ben": 2}
+    assert len(reloaded) == len(history) == 5
+    undo(reloaded)
+    assert reloaded.last_reset() is None
+    assert ScoreHistory(tmp_path, "Class 1A").last_reset() is None
+
+def test_undo_restores_the_latest_reset_only(tmp_path):
+    history = ScoreHistory(tmp_path, "c")
+    history.record([("Ann", 3)], POINT)
+    reset(history, {"Ann": 3})
+    history.record([("Ben", 5)], POINT)
+    reset(history, {"Ben": 5})
+    undo(history)
+    assert history.last_reset() == {"Ann": 3}
+    assert ScoreHistory(tmp_path, "c").last_reset() == {"Ann": 3}
+    undo(history)
+    assert history.last_reset() is None
+
+def test_trends_count_class_points_and_skip_resets(tmp_path):
+    history = ScoreHistory(tmp_path, "c")
+    history.record([("Ann", 3), ("Ben", 2)], POINT)
+    history.record([("Group 1", 4)], GROUP)
+    reset(history, {"Ann": 3, "Ben": 2})
+    [(_, class_points)] = history.trend("day")
+    assert class_points == 9
+    assert [points for _, points in history.trend("week", "Ann")] == [3]
+
+def test_catch_up_with_another_process(tmp_path):
+    a, b = ScoreHistory(tmp_path, "c"), ScoreHistory(tmp_path, "c")
+    a.record([("Ann", 1)], POINT)
+    b.record([("Cat", 2)], POINT)   # b catches up before appending, so name ids stay shared
+    a.refresh()
+    assert a.names == b.names == ["Ann", "Cat"]
+    assert a.term == b.term == {"Ann": 1, "Cat": 2}
+    reset(b, {"Ann": 1, "Cat": 2})
+    a.record([("Dan", 1)], POINT)   # a write catches up too
+    assert a.last_reset() == {"Ann": 1, "Cat": 2}
+    assert a.term == {"Ann": 1, "Cat": 2, "Dan": 1}
+
+def test_torn_rows_are_left_for_later(tmp_path):
+    a, b = ScoreHistory(tmp_path, "c"), ScoreHistory(tmp_path, "c")
+    a.record([("Ann", 1)], POINT)
+    with open(a._file("ts"), "ab") as f: f.write(b"\0" * 8)   # a crash after the first column
+    b.refresh()
+    assert len(b) == 1 and b.term == {"Ann": 1}
+
+def test_refresh_reloads_after_clear(tmp_path):
+    a, b = ScoreHistory(tmp_path, "c"), ScoreHistory(tmp_path, "c")
+    a.record([("Ann", 1)], POINT)
+    b.refresh()
+    a.clear()
+    b.refresh()
+    assert len(b) == 0 and not b.term and b.names == []
@@ -0,0 +1,29 @@
+from leaderboard import Leaderboard
+
+STUDENTS = ["Ann", "Ben", "Cat", "Dan", "Eve"]
+
+
+def test_ties_share_a_rank_in_roster_order():
+    board = Leaderboard(STUDENTS, {"Ann": 5, "Ben": 3, "Cat": 5, "Eve": 3})
+    assert board.top(5) == [(1, "Ann", 5), (1, "Cat", 5), (3, "Ben", 3), (3, "Eve", 3), (5, "Dan", 0)]
+    assert [board.rank(name) for name in STUDENTS] == [1, 3, 1, 5, 3]
+
+def test_a_page_starting_mid_tie_keeps_the_shared_rank():
+    board = Leaderboard(STUDENTS, {"Ann": 5, "Ben": 3, "Cat": 5, "Eve": 3})
+    assert board.page(1, 4) == [(1, "Cat", 5), (3, "Ben", 3), (3, "Eve", 3)]
+    assert board.page(4, 10) == [(5, "Dan", 0)]
+
+def test_updates_move_students_and_break_ties():
+    board = Leaderboard(STUDENTS, {"Ann": 5, "Ben": 3, "Cat": 5, "Eve": 3})
+    board.update("Eve", 6)
+    board.update("Ann", 3)
+    assert board.top(5) == [(1, "Eve", 6), (2, "Cat", 5), (3, "Ann", 3), (3, "Ben", 3), (5, "Dan", 0)]
+    assert board.rank("Ann") == board.rank("Ben") == 3
+    board.update("Dan", 3)
+    assert board.page(2, 5) == [(3, "Ann", 3), (3, "Ben", 3), (3, "Dan", 3)]
+    assert len(board) == 5 and "Dan" in board and "Zed" not in board
+
+def test_everyone_tied():
+    board = Leaderboard(STUDENTS, {})
+    assert {rank for rank, _, _ in board.top(5)} == {1}
+    assert [name for _, name, _ in board.top(5)] == STUDENTS
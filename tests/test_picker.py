@@ -0,0 +1,56 @@
+import random
+from collections import Counter
+
+from picker import WeightedPicker
+
+DRAWS = 40_000
+
+
+def frequencies(picker, draws=DRAWS):
+    counts = Counter(picker.draw() for _ in range(draws))
+    return {name: n / draws for name, n in counts.items()}
+
+def assert_matches(freq, weights, tolerance=0.015):
+    total = sum(weights.values())
+    assert set(freq) == {name for name, w in weights.items() if w > 0}
+    for name, weight in weights.items():
+        if weight > 0: assert abs(freq[name] - weight / total) < tolerance, (name, freq[name], weight / total)
+
+
+def test_draws_follow_weights():
+    weights = {"A": 1, "B": 2, "C": 3, "D": 4}
+    assert_matches(frequencies(WeightedPicker(weights.items(), random.Random(1))), weights)
+
+def test_lowering_a_weight_keeps_the_table():
+    weights = {"A": 4, "B": 4, "C": 4, "D": 4}
+    picker = WeightedPicker(weights.items(), random.Random(2))
+    picker.draw()
+    weights["A"] = 1
+    picker.set("A", 1)
+    assert not picker._stale
+    assert_matches(frequencies(picker), weights)
+
+def test_raising_adding_and_removing_after_draws():
+    weights = {"A": 1, "B": 1, "C": 1}
+    picker = WeightedPicker(weights.items(), random.Random(3))
+    picker.draw()
+    weights.update(A=5, D=2, C=0)
+    for name in ("A", "D", "C"): picker.set(name, weights[name])
+    assert len(picker) == 3
+    assert_matches(frequencies(picker), weights)
+
+def test_many_small_decreases_rebuild_the_table():
+    weights = {f"S{i}": 10 for i in range(20)}
+    picker = WeightedPicker(weights.items(), random.Random(4))
+    picker.draw()
+    for name in list(weights)[:15]:
+        weights[name] = 1
+        picker.set(name, 1)
+    assert_matches(frequencies(picker), weights)
+    assert picker._bound_total == sum(weights.values())
+
+def test_all_zero_draws_none():
+    picker = WeightedPicker([("A", 1)], random.Random(5))
+    picker.set("A", 0)
+    assert picker.draw() is None
+    assert len(picker) == 0
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from classroom import ClassroomStore
+from history import ScoreHistory
+from replicas import Coordinator
+from storage import DEFAULT_CLASSROOM, CsvStorage, SqliteStorage
+
+ROSTER = [f"Student {i}" for i in range(1, 7)]
+
+
+@pytest.fixture(params=["sqlite", "csv"])
+def open_replica(request, tmp_path):
+    """Opens ClassroomStores over one classroom, the way each app process does."""
+    opened = []
+    def open_replica():
+        if request.param == "sqlite": storage = SqliteStorage(str(tmp_path / "classroom.db"))
+        else: storage = CsvStorage(*(str(tmp_path / f"classroom_{name}") for name in
+                                     ("data.csv", "journal.csv", "groups.json", "seats.json", "picks.csv", "live.json")))
+        coordinator = Coordinator(str(tmp_path / "coordination"), poll_interval=0.2)
+        opened.append(coordinator)
+        history = ScoreHistory(str(tmp_path / "history"), DEFAULT_CLASSROOM)
+        return ClassroomStore(storage, DEFAULT_CLASSROOM, ROSTER, history, coordinator)
+    yield open_replica
+    for coordinator in opened: coordinator.close()
+
+
+def test_a_write_catches_up_first(open_replica):
+    a, b = open_replica(), open_replica()
+    a.coordinator.close()   # no announcements: a only learns of b's write through its own
+    b.add_points("Student 1", 5)
+    a.add_points("Student 2", 1)
+    assert a.scores == {**dict.fromkeys(ROSTER, 0), "Student 1": 5, "Student 2": 1}
+
+def test_a_refused_write_still_bumps_the_version(open_replica):
+    a, b = open_replica(), open_replica()
+    a.coordinator.close()
+    b.add_points("Student 1", 5)
+    version = a.version
+    assert not a.swap_seats(0, 1, ["nobody", "else"])
+    # a loaded b's point while refusing the swap; its sessions must rerun to show it
+    assert a.scores["Student 1"] == 5
+    assert a.version != version
+
+def test_replicas_converge(open_replica):
+    a, b = open_replica(), open_replica()
+    a.start_battle([ROSTER[:3], ROSTER[3:]])
+    b.add_group_points([(0, 2), (1, 1)], "s")
+    a.add_group_points([(1, 3), (9, 1)], "s")
+    for name in ROSTER: (a if name < "Student 4" else b).add_points(name, 1)
+    # Announcements arrive asynchronously (or with the next poll)
+    deadline = time.time() + 5
+    while a.snapshot()[1:5] != b.snapshot()[1:5] and time.time() < deadline: time.sleep(0.05)
+    assert a.snapshot()[1:5] == b.snapshot()[1:5]
+    assert a.snapshot()[2] == dict.fromkeys(ROSTER, 1)
+    assert a.snapshot()[4] == {0: 2, 1: 4}
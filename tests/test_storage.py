@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from storage import CsvStorage
+
+ROSTER = ["Ann", "Ben", "Cat"]
+
+
+@pytest.fixture
+def files(tmp_path):
+    names = ("data_file", "journal_file", "groups_file", "seats_file", "picks_file", "live_file")
+    return {name: str(tmp_path / f"{name}.csv") for name in names}
+
+def storage(files, **kwargs):
+    return CsvStorage(**files, **kwargs)
+
+
+def test_first_visit_writes_the_snapshot(files):
+    assert storage(files).load_roster("default", ROSTER) == (ROSTER, {name: 0 for name in ROSTER})
+    assert list(storage(files).iter_students("default")) == [(name, 0) for name in ROSTER]
+
+def test_journal_is_replayed_on_load(files):
+    s = storage(files)
+    s.load_roster("default", ROSTER)
+    for name, delta in [("Ann", 2), ("Ben", 1), ("Ann", -1), ("Zed", 5)]: s.record_score("default", name, delta, "s1")
+    assert os.path.getsize(files["journal_file"]) > 0
+    assert storage(files).load_roster("default", ROSTER)[1] == {"Ann": 1, "Ben": 1, "Cat": 0}   # Zed isn't on the roster
+
+def test_torn_lines_are_skipped_and_not_glued_to(files):
+    s = storage(files)
+    s.load_roster("default", ROSTER)
+    s.record_score("default", "Ann", 1, "s1")
+    with open(files["journal_file"], "a") as f: f.write("1700000000.000,s1,Ben,")   # crash mid-append
+    s.record_score("default", "Cat", 4, "s1")
+    with open(files["journal_file"], "a") as f: f.write("1700000000.000,s1,Ann,x\n")
+    assert storage(files).load_roster("default", ROSTER)[1] == {"Ann": 1, "Ben": 0, "Cat": 4}
+
+def test_compaction_folds_the_journal_into_the_snapshot(files):
+    s = storage(files, compact_bytes=300)
+    s.load_roster("default", ROSTER)
+    for i in range(60): s.record_score("default", ROSTER[i % 3], 1, "s1")
+    assert os.path.getsize(files["journal_file"]) <= 300
+    with open(files["data_file"], encoding="utf-8") as f: assert f.readline().strip() == "Name,Score"
+    assert storage(files).load_roster("default", ROSTER)[1] == {name: 20 for name in ROSTER}
+
+def test_save_roster_empties_the_journal(files):
+    s = storage(files)
+    s.load_roster("default", ROSTER)
+    s.record_score("default", "Ann", 3, "s1")
+    s.save_roster("default", ["Ann", "Dan"], {"Ann": 3, "Dan": 1})
+    assert os.path.getsize(files["journal_file"]) == 0
+    assert storage(files).load_roster("default", ROSTER) == (["Ann", "Dan"], {"Ann": 3, "Dan": 1})